@@ -0,0 +1,125 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+# Lifetime of a session token issued by /auth
+TOKEN_TTL = int(os.environ.get('SESSION_TTL_SECONDS', 8 * 3600))
+
+# Wrong access code guesses per client IP: a burst of AUTH_BURST, then one
+# every AUTH_REFILL_SECONDS. Correct codes are free, so a room of people
+# behind one NAT address can all sign in
+AUTH_BURST = 5
+AUTH_REFILL_SECONDS = 12
+
+# Client IPs tracked by a limiter before idle ones are dropped
+MAX_CLIENTS = 10000
+
+
+def access_code():
+    return os.environ.get('DEMO_ACCESS_CODE', '')
+
+
+def check_code(code):
+    expected = access_code()
+    if not expected or not isinstance(code, str):
+        return False
+    return hmac.compare_digest(code.encode(), expected.encode())
+
+
+def _secret():
+    # Without SESSION_SECRET, tokens are signed with a key derived from the
+    # access code, so changing the code also revokes every issued token
+    secret = os.environ.get('SESSION_SECRET') or access_code()
+    return hashlib.sha256(b'zonos-session:' + secret.encode()).digest()
+
+
+def _sign(payload):
+    digest = hmac.new(_secret(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def issue_token(ttl=TOKEN_TTL):
+    """A signed ``<expiry>.<signature>`` token; nothing is stored server-side."""
+    payload = str(int(time.time()) + ttl)
+    return f'{payload}.{_sign(payload)}'
+
+
+def verify_token(token):
+    payload, _, signature = (token or '').partition('.')
+    if not payload.isdecimal() or len(payload) > 12:
+        return False
+    if not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+        return False
+    return int(payload) > time.time()
+
+
+def authorized(request):
+    """True if the request carries a valid session token from /auth.
+
+    Endpoints stay open when no DEMO_ACCESS_CODE is configured (local use).
+    """
+    if not access_code():
+        return True
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and verify_token(token.strip())
+
+
+class TokenBucket:
+    """Per-key token buckets: ``burst`` requests at once, refilled at ``rate``/s."""
+
+    def __init__(self, rate, burst, max_keys=MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def _tokens(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def take(self, key):
+        """Spend a token for ``key``; returns ``(allowed, retry_after_seconds)``."""
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / self.rate
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return allowed, retry_after
+
+    def check(self, key):
+        """Like ``take`` but spends nothing; pair it with ``charge``."""
+        with self._lock:
+            tokens = self._tokens(key, time.monotonic())
+        return (True, 0.0) if tokens >= 1 else (False, (1 - tokens) / self.rate)
+
+    def charge(self, key):
+        """Spend a token for ``key`` after the fact. Concurrent requests that
+        all passed ``check`` are each charged, so the balance may go below
+        zero and the wait grows accordingly."""
+        now = time.monotonic()
+        with self._lock:
+            self._buckets[key] = (self._tokens(key, now) - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        full = self.burst / self.rate
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full:
+                del self._buckets[key]
+        while len(self._buckets) > self.max_keys:
+            del self._buckets[next(iter(self._buckets))]
+
+
+auth_limiter = TokenBucket(1 / AUTH_REFILL_SECONDS, AUTH_BURST)
@@ -0,0 +1,172 @@
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 24 * 3600
+
+# Cosine similarity (TF-IDF over content words) above which a cached
+# question counts as the same question
+DEFAULT_THRESHOLD = 0.9
+
+# Response header reporting HIT / MISS / BYPASS
+CACHE_HEADER = 'X-Chat-Cache'
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+_STOPWORDS = frozenset('''
+    a an and are as at be can could do does did for from how i i'm in is it it's me my of on or please
+    should tell the that this to us we what what's whats when where which who why will with would you
+    your about explain give show some any there their
+'''.split())
+
+
+def normalize(text):
+    """Lowercase words without punctuation; the exact-match form of a question."""
+    return ' '.join(_WORD_RE.findall(text.lower().replace('’', "'")))
+
+
+def _stem(word):
+    """Crude suffix stripping, so "rules", "rule" and "creating", "create" meet."""
+    if word.endswith('ies') and len(word) > 4:
+        word = word[:-3] + 'y'
+    elif word.endswith(('ses', 'xes', 'zes', 'ches', 'shes')):
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+        word = word[:-1]
+    for suffix in ('ing', 'ed'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:-1] if word.endswith('e') and len(word) > 3 else word
+
+
+def terms(text):
+    """Content words of a question, stemmed, with their counts."""
+    return Counter(_stem(w.replace("'", '')) for w in normalize(text).split() if w not in _STOPWORDS)
+
+
+class AnswerCache:
+    """Replies to stand-alone questions, matched on similar wording.
+
+    Entries are keyed on the normalized question plus a hash of the
+    user's taught context, so different contexts never share answers.
+    A question that is not an exact match is compared by TF-IDF cosine
+    similarity with the cached questions that share a content word with
+    it (found through an inverted index). The cache holds at most
+    ``max_entries`` replies, each for ``ttl`` seconds, and evicts the
+    least recently used.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, threshold=DEFAULT_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()  # key -> (expires_at, terms, reply)
+        self._index = {}  # (context, term) -> set of keys
+        self._df = Counter()  # term -> cached questions containing it
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _context(context):
+        return hashlib.sha256((context or '').encode('utf-8')).hexdigest()[:16]
+
+    def get(self, question, context=''):
+        ctx = self._context(context)
+        key = (ctx, normalize(question))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                key = self._similar(ctx, terms(question), now)
+                entry = self._entries.get(key) if key else None
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, question, reply, context=''):
+        ctx = self._context(context)
+        key = (ctx, normalize(question))
+        if not key[1] or not reply:
+            return
+        words = terms(question)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, words, reply)
+            for term in words:
+                self._index.setdefault((ctx, term), set()).add(key)
+                self._df[term] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self._df.clear()
+
+    def _similar(self, ctx, words, now):
+        """Key of the most similar live question above the threshold, or None."""
+        if not words:
+            return None
+        candidates = set()
+        for term in words:
+            candidates |= self._index.get((ctx, term), set())
+        total = len(self._entries) + 1
+
+        def weights(counts):
+            return {t: c * (math.log(total / (self._df[t] + 1)) + 1) for t, c in counts.items()}
+
+        query = weights(words)
+        query_norm = math.sqrt(sum(w * w for w in query.values()))
+        best, best_score = None, self.threshold
+        for key in candidates:
+            expires_at, cached_words, _ = self._entries[key]
+            if expires_at <= now:
+                continue
+            cached = weights(cached_words)
+            dot = sum(w * cached.get(t, 0.0) for t, w in query.items())
+            score = dot / (query_norm * math.sqrt(sum(w * w for w in cached.values())))
+            if score >= best_score:
+                best, best_score = key, score
+        return best
+
+    def _remove(self, key):
+        _, words, _ = self._entries.pop(key)
+        for term in words:
+            keys = self._index.get((key[0], term))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[(key[0], term)]
+            self._df[term] -= 1
+            if self._df[term] <= 0:
+                del self._df[term]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answers():
+    """Return the process-wide answer cache, or None if CHAT_CACHE=0."""
+    global _cache
+    if os.environ.get('CHAT_CACHE', '1') == '0':
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache(
+                    max_entries=int(os.environ.get('CHAT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+                    ttl=float(os.environ.get('CHAT_CACHE_TTL', DEFAULT_TTL)),
+                )
+    return _cache
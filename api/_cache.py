@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from api._graphql import GraphQLSyntaxError, normalize, operation_info
+
+# Seconds to cache a query operation, by root field (the shortest TTL wins)
+_QUERY_TTLS = {
+    'countries': 24 * 3600,
+    'currencies': 24 * 3600,
+}
+_DEFAULT_QUERY_TTL = 300
+
+# Zonos exposes these calculations as mutations, but they only compute a
+# classification or estimate from their input and create no record a later
+# call refers to, so their results are as cacheable as a query. The landed
+# cost workflow steps are not listed: each creates a record whose ID feeds
+# the next step (orderCreate needs the landedCostId), and a cached reply
+# would hand every user the same one. Anything not listed here (orderCreate,
+# partyScreen, ruleCreate, shipmentCreateWorkflow, ...) is never cached.
+_PURE_MUTATION_TTLS = {
+    'classificationsCalculate': 3600,
+    'countryOfOriginInfer': 3600,
+    'valueEstimate': 3600,
+    'itemRestrictionApply': 600,
+    # Vision extraction from an uploaded photo (keyed on the image digest)
+    'itemsExtract': 3600,
+}
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# Response header reporting HIT / MISS / BYPASS
+CACHE_HEADER = 'X-Proxy-Cache'
+
+
+class ResponseCache:
+    """Thread-safe LRU cache bounded by the total size of stored bodies."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, size, ttl):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+
+def cache_ttl(query, operation_name=None):
+    """Return how long a response to ``query`` may be cached, or None.
+
+    The operation is the one ``operation_name`` selects; a document with
+    several operations and no usable name is never cached.
+    """
+    try:
+        op_type, _, fields = operation_info(query, operation_name)
+    except GraphQLSyntaxError:
+        return None
+    if not fields:
+        return None
+    if op_type == 'query':
+        return min(_QUERY_TTLS.get(f, _DEFAULT_QUERY_TTL) for f in fields)
+    if op_type == 'mutation' and all(f in _PURE_MUTATION_TTLS for f in fields):
+        return min(_PURE_MUTATION_TTLS[f] for f in fields)
+    return None
+
+
+def _graphql_body(payload):
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return None
+    if not isinstance(payload, dict) or not isinstance(payload.get('query'), str):
+        return None
+    return payload
+
+
+def request_key(url, method, key_mode, payload, credential=''):
+    """Return ``(key, ttl)`` for a cacheable proxy request, else ``(None, None)``.
+
+    The key is a hash of the URL, method, key mode, normalized query text and
+    canonical variables; ``credential`` separates entries fetched with
+    different client-supplied keys.
+    """
+    body = _graphql_body(payload)
+    if body is None:
+        return None, None
+    ttl = cache_ttl(body['query'], body.get('operationName'))
+    if ttl is None:
+        return None, None
+    return _identity(url, method, key_mode, body, credential), ttl
+
+
+def coalesce_key(url, method, key_mode, payload):
+    """Key shared by identical read-only requests, or None.
+
+    Only ``query`` operations qualify (the one ``operationName`` selects);
+    mutations are never coalesced, even the side-effect-free ones the cache
+    accepts, and neither are ambiguous multi-operation documents.
+    """
+    body = _graphql_body(payload)
+    if body is None:
+        return None
+    try:
+        op_type, _, _ = operation_info(body['query'], body.get('operationName'))
+    except GraphQLSyntaxError:
+        return None
+    if op_type != 'query':
+        return None
+    return _identity(url, method, key_mode, body)
+
+
+def _identity(url, method, key_mode, body, credential=''):
+    canonical = json.dumps([
+        url,
+        method.upper(),
+        key_mode,
+        normalize(body['query']),
+        body.get('variables') or {},
+        body.get('operationName'),
+        hashlib.sha256(credential.encode()).hexdigest() if credential else '',
+    ], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def is_cacheable_response(status, body):
+    """Only successful responses without GraphQL errors are worth replaying."""
+    return status == 200 and b'"errors"' not in body
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def enable(max_bytes=DEFAULT_MAX_BYTES):
+    """Turn the process-wide response cache on (used by server.py --cache)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(max_bytes)
+        else:
+            _cache.max_bytes = max_bytes
+    return _cache
+
+
+def get_cache():
+    """Return the shared cache, or None when caching is off.
+
+    Serverless deployments opt in with PROXY_CACHE=1 (and optionally
+    PROXY_CACHE_MAX_BYTES).
+    """
+    if _cache is None and os.environ.get('PROXY_CACHE', '').lower() in ('1', 'true', 'yes'):
+        max_bytes = int(os.environ.get('PROXY_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        return enable(max_bytes)
+    return _cache
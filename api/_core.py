@@ -0,0 +1,307 @@
+import importlib
+import json
+import os
+import re
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+from api import _metrics
+
+ALLOWED_ORIGIN = 'https://zonos-api-demo.vercel.app'
+
+# Errors raised while writing to a client that has gone away
+_DISCONNECTED = (BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
+
+# One multipart/form-data field; ``filename`` is None for plain fields
+FormPart = namedtuple('FormPart', 'filename content_type data')
+
+_DISPOSITION_PARAM_RE = re.compile(r';\s*(\w+)="([^"]*)"')
+
+
+class HTTPError(Exception):
+    """Raise from an endpoint to answer with ``payload`` as JSON."""
+
+    def __init__(self, status, payload, headers=None):
+        super().__init__(status, payload)
+        self.status = status
+        self.payload = payload
+        self.headers = headers or {}
+
+
+class Request:
+    def __init__(self, handler, params=None):
+        parsed = urlparse(handler.path)
+        self.method = handler.command
+        self.path = parsed.path
+        self.query = parse_qs(parsed.query)
+        for key, value in (params or {}).items():
+            self.query.setdefault(key, [value])
+        self.headers = handler.headers
+        self._rfile = handler.rfile
+        self._body = None
+
+    def arg(self, name, default=None):
+        """First value of query parameter ``name``."""
+        return self.query.get(name, [default])[0]
+
+    @property
+    def body(self):
+        if self._body is None:
+            length = int(self.headers.get('Content-Length', 0) or 0)
+            self._body = self._rfile.read(length) if length > 0 else b''
+            timer = _metrics.current()
+            if timer is not None:
+                timer.request_bytes = len(self._body)
+        return self._body
+
+    def json(self):
+        """Decode the body as JSON (ValueError if it is not)."""
+        body = self.body
+        with _metrics.timed('parse'):
+            return json.loads(body)
+
+    def form(self):
+        """Parse a multipart/form-data body into ``{name: FormPart}``."""
+        match = re.search(r'boundary="?([^";]+)"?', self.headers.get('Content-Type', ''))
+        if not match:
+            raise ValueError('Missing multipart boundary')
+        delimiter = b'--' + match.group(1).encode('latin-1')
+        body = self.body
+        fields = {}
+        start = body.find(delimiter)
+        while start != -1:
+            start += len(delimiter)
+            if body.startswith(b'--', start):
+                break  # closing delimiter
+            end = body.find(b'\r\n' + delimiter, start)
+            if end == -1:
+                raise ValueError('Truncated multipart body')
+            head_end = body.find(b'\r\n\r\n', start, end)
+            if head_end == -1:
+                raise ValueError('Malformed multipart part')
+            part_headers = {}
+            for line in body[start:head_end].decode('latin-1').split('\r\n'):
+                name, _, value = line.partition(':')
+                if value:
+                    part_headers[name.strip().lower()] = value.strip()
+            params = dict(_DISPOSITION_PARAM_RE.findall(part_headers.get('content-disposition', '')))
+            if 'name' in params:
+                fields[params['name']] = FormPart(
+                    params.get('filename'),
+                    part_headers.get('content-type', 'text/plain'),
+                    body[head_end + 4:end],
+                )
+            start = body.find(delimiter, end)
+        return fields
+
+    @property
+    def client_ip(self):
+        return (
+            self.headers.get('x-forwarded-for', '').split(',')[0].strip()
+            or self.headers.get('x-real-ip', '')
+            or ''
+        )
+
+
+class Response:
+    """An endpoint's answer.
+
+    ``body`` is bytes, or an iterable of byte chunks that is streamed to the
+    client and closed early if the client disconnects. Callables in
+    ``after`` run once the response has been written.
+    """
+
+    def __init__(self, body=b'', status=200, headers=None, content_type=None):
+        self.body = body
+        self.status = status
+        self.headers = list((headers or {}).items()) if isinstance(headers, dict) else list(headers or [])
+        if content_type:
+            self.headers.insert(0, ('Content-Type', content_type))
+        self.after = []
+
+
+def json_response(data, status=200, headers=None):
+    with _metrics.timed('serialize'):
+        body = json.dumps(data).encode()
+    return Response(body, status, headers, 'application/json')
+
+
+def sse_frame(event, data, event_id=None):
+    """Encode one server-sent event."""
+    frame = f'event: {event}\ndata: {json.dumps(data)}\n\n'
+    if event_id is not None:
+        frame = f'id: {event_id}\n' + frame
+    return frame.encode()
+
+
+def event_stream(chunks, headers=None):
+    """Stream ``chunks`` (already SSE-encoded bytes) as text/event-stream."""
+    response = Response(chunks, 200, headers, 'text/event-stream')
+    response.headers += [('Cache-Control', 'no-cache'), ('X-Accel-Buffering', 'no')]
+    return response
+
+
+class Endpoint:
+    """One serverless function: a map of HTTP method to view function.
+
+    Takes care of CORS, preflight, JSON error mapping and writing the
+    response, so views only turn a ``Request`` into a ``Response``.
+    """
+
+    def __init__(self, views, allow_headers='Content-Type', expose_headers=None,
+                 internal_error=({'error': 'Internal error'}, 500, None)):
+        self.views = views
+        # Label for metrics: the module name, e.g. "proxy"
+        self.name = next(iter(views.values())).__module__.rsplit('.', 1)[-1]
+        self.allow_methods = ', '.join(list(views) + ['OPTIONS'])
+        self.allow_headers = allow_headers
+        self.expose_headers = expose_headers
+        self.internal_error = internal_error
+
+    def cors_headers(self):
+        headers = [
+            ('Access-Control-Allow-Origin', ALLOWED_ORIGIN),
+            ('Access-Control-Allow-Methods', self.allow_methods),
+            ('Access-Control-Allow-Headers', self.allow_headers),
+        ]
+        if self.expose_headers:
+            headers.append(('Access-Control-Expose-Headers', self.expose_headers))
+        return headers
+
+    def handle(self, handler, params=None):
+        """Serve the request held by ``handler`` (a BaseHTTPRequestHandler)."""
+        with _metrics.track(self.name) as timer:
+            response = self._respond(handler, params)
+            timer.status = response.status
+            timer.response_bytes = write_response(handler, response, self.cors_headers())
+        for callback in response.after:
+            callback()
+
+    def _respond(self, handler, params):
+        if handler.command == 'OPTIONS':
+            return Response()
+        view = self.views.get(handler.command)
+        if view is None:
+            return json_response({'error': 'Method not allowed'}, 405)
+        try:
+            return view(Request(handler, params))
+        except HTTPError as e:
+            return json_response(e.payload, e.status, e.headers)
+        except Exception:
+            # The client only sees a generic error; keep the details in the
+            # logs. Imported here: traceback pulls in tokenize and textwrap,
+            # which would otherwise add milliseconds to every cold start
+            import traceback
+            traceback.print_exc()
+            payload, status, headers = self.internal_error
+            return json_response(payload, status, headers)
+
+    def handler_class(self):
+        """Build the ``handler`` class Vercel's Python runtime looks for."""
+        endpoint = self
+
+        class handler(BaseHTTPRequestHandler):
+            def _dispatch(self):
+                endpoint.handle(self)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = _dispatch
+
+        return handler
+
+
+def write_response(handler, response, extra_headers=()):
+    """Send ``response``; returns the number of body bytes written."""
+    body = response.body
+    written = 0
+    streamed = not isinstance(body, (bytes, bytearray))
+    try:
+        handler.send_response(response.status)
+        for key, value in response.headers:
+            handler.send_header(key, value)
+        for key, value in extra_headers:
+            handler.send_header(key, value)
+        if streamed:
+            # Length unknown up front: the end of the body is the end of the
+            # connection
+            handler.close_connection = True
+        elif response.status not in (204, 304) and 'Content-Length' not in (k for k, _ in response.headers):
+            handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        if streamed:
+            for chunk in body:
+                handler.wfile.write(chunk)
+                handler.wfile.flush()
+                written += len(chunk)
+        else:
+            handler.wfile.write(body)
+            handler.wfile.flush()
+            written = len(body)
+    except _DISCONNECTED:
+        pass
+    finally:
+        close = getattr(body, 'close', None)
+        if streamed and close is not None:
+            close()
+    return written
+
+
+class App:
+    """Every api/ endpoint mounted in one process, for server.py.
+
+    Routes come from the rewrites in vercel.json, so local development and
+    the deployment resolve paths identically. Endpoint modules are imported
+    on their first request.
+    """
+
+    def __init__(self, config_path=None):
+        if config_path is None:
+            config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'vercel.json')
+        with open(config_path, encoding='utf-8') as f:
+            rewrites = json.load(f).get('rewrites', [])
+        self._routes = []
+        for rule in rewrites:
+            pattern = re.sub(r':(\w+)', r'(?P<\1>[^/]+)', rule['source'])
+            destination = urlparse(rule['destination'])
+            params = {k: v[0] for k, v in parse_qs(destination.query).items()}
+            self._routes.append((re.compile(f'^{pattern}$'), self._module(destination.path), params))
+        self._endpoints = {}
+
+    @staticmethod
+    def _module(path):
+        return path.strip('/').replace('/', '.')
+
+    def match(self, path):
+        """Return ``(module_name, params)`` for a request path, or None."""
+        path = urlparse(path).path
+        for regex, module, params in self._routes:
+            m = regex.match(path)
+            if m:
+                return module, {k: m.group(v[1:]) if v.startswith(':') else v
+                                for k, v in params.items()}
+        name = path[len('/api/'):] if path.startswith('/api/') else ''
+        if re.match(r'^[a-z][a-z0-9_]*$', name):
+            return f'api.{name}', {}
+        return None
+
+    def endpoint(self, module_name):
+        endpoint = self._endpoints.get(module_name)
+        if endpoint is None:
+            endpoint = self._endpoints[module_name] = importlib.import_module(module_name).endpoint
+        return endpoint
+
+    def dispatch(self, handler):
+        """Serve ``handler``'s request if it targets an endpoint."""
+        matched = self.match(handler.path)
+        if matched is None:
+            return False
+        module_name, params = matched
+        try:
+            endpoint = self.endpoint(module_name)
+        except ModuleNotFoundError as e:
+            if e.name != module_name:
+                raise
+            return False
+        endpoint.handle(handler, params)
+        return True
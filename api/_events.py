@@ -0,0 +1,196 @@
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+from api._store import get_store, summarize_row
+
+_UUID_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+
+# Events kept per session for clients that (re)connect with a cursor
+HISTORY = 50
+_MAX_SESSIONS = 1024
+
+# How often a long-poll re-reads storage when events arrive in another
+# process; no more often than the page's own poll
+POLL_INTERVAL = 3.0
+
+
+def valid_session(session_id):
+    """Webhook sessions are client-generated UUIDs."""
+    return bool(session_id and _UUID_RE.match(session_id))
+
+
+def cursor_of(row):
+    """Where a row sits in its session: the id its store assigned, which
+    grows in insert order, or ``received_at`` for rows no store has
+    written (in-process only)."""
+    return row.get('id') or row['received_at']
+
+
+def parse_cursor(value):
+    """A cursor from ``since`` or Last-Event-ID: a store id or a timestamp."""
+    if not value:
+        return None
+    return int(value) if value.isdecimal() else value
+
+
+def is_newer(position, cursor):
+    """True if ``position`` comes after ``cursor``. A cursor of the other
+    kind (from a server keeping events differently) matches everything."""
+    if cursor is None or type(position) is not type(cursor):
+        return True
+    return position > cursor
+
+
+def with_id(row):
+    """``row`` with an ``id``; rows no store has written have none, so the
+    cursor stands in."""
+    # Broker rows are shared with the ingest queue, so never mutate them
+    return dict(row, id=cursor_of(row))
+
+
+def now_cursor():
+    """Timestamp used as ``received_at``, and as the cursor of rows no
+    store has written."""
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+
+class EventBroker:
+    """In-process fan-out of freshly ingested webhook events.
+
+    Keeps the last ``HISTORY`` events per session and wakes every waiting
+    stream as soon as one is published. Cursors are store ids, or
+    ``received_at`` timestamps (which sort correctly as strings) when
+    nothing stores the rows.
+    """
+
+    def __init__(self, history=HISTORY, max_sessions=_MAX_SESSIONS):
+        self.history = history
+        self.max_sessions = max_sessions
+        # Set by servers that host ingestion and streaming in one process
+        self.local = False
+        # Streams served at once; each holds a request thread for its whole
+        # life, so servers size this to their worker pool (0: no streams)
+        self.max_streams = 0
+        self._streams = 0
+        self._sessions = OrderedDict()  # session -> deque of rows
+        self._cond = threading.Condition()
+
+    def publish(self, session, row):
+        with self._cond:
+            events = self._sessions.get(session)
+            if events is None:
+                events = self._sessions[session] = deque(maxlen=self.history)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session)
+            events.append(row)
+            self._cond.notify_all()
+
+    def since(self, session, cursor=None):
+        """Events newer than ``cursor``, oldest first."""
+        with self._cond:
+            events = list(self._sessions.get(session, ()))
+        if cursor is not None:
+            events = [e for e in events if is_newer(cursor_of(e), cursor)]
+        return events
+
+    def wait(self, session, cursor, timeout):
+        """Block until there are events newer than ``cursor`` or timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                events = self.since(session, cursor)
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events
+                self._cond.wait(remaining)
+
+    def clear(self, session):
+        with self._cond:
+            self._sessions.pop(session, None)
+
+    def can_stream(self):
+        """True if a client asking for a stream now would get one."""
+        return self.local and self._streams < self.max_streams
+
+    def open_stream(self):
+        """Claim a stream slot; False when streams are off or all in use."""
+        with self._cond:
+            if not self.can_stream():
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._cond:
+            self._streams -= 1
+
+
+broker = EventBroker()
+
+
+def _store():
+    """The store to read events from, or None to use the broker.
+
+    A server that ingests in-process answers from the broker unless its
+    store is local too (SQLite), which is as fast and survives restarts.
+    """
+    store = get_store()
+    if store is None or (broker.local and not store.local):
+        return None
+    return store
+
+
+def _store_cursor(cursor):
+    # Stores page by id; a timestamp cursor from elsewhere starts over
+    return cursor if isinstance(cursor, int) else None
+
+
+def latest_cursor(session):
+    """Cursor of the newest event for ``session`` (None if empty).
+
+    A one-column, one-row read, cheap enough to back ETag revalidation.
+    """
+    store = _store()
+    if store is not None:
+        return store.latest(session)
+    events = broker.since(session)
+    return cursor_of(events[-1]) if events else None
+
+
+def recent_events(session, since=None, summary=False, limit=HISTORY):
+    """Events after the cursor ``since``, oldest first, from storage or the
+    broker.
+
+    Stored events are paged by store id, not by ``received_at``: rows
+    reach a remote store through per-instance write-behind queues, so one
+    stamped earlier can be committed after a later one has been read, but
+    its id is only assigned at insert. With ``summary`` the payload and
+    headers are left out.
+    """
+    store = _store()
+    if store is not None:
+        return store.read(session, _store_cursor(since), limit, summary)
+    events = broker.since(session, since)[-limit:]
+    return [summarize_row(e) for e in events] if summary else events
+
+
+def wait_for_events(session, since, timeout):
+    """Wait up to ``timeout`` seconds for events newer than ``since``.
+
+    Uses the in-process broker when ingestion runs in this process (or no
+    storage is configured); otherwise polls storage for new rows only.
+    """
+    store = get_store()
+    if broker.local or store is None:
+        return broker.wait(session, since, timeout)
+    deadline = time.monotonic() + timeout
+    while True:
+        stored = store.read(session, _store_cursor(since), HISTORY)
+        remaining = deadline - time.monotonic()
+        if stored or remaining <= 0:
+            return stored
+        time.sleep(min(POLL_INTERVAL, remaining))
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from api._graphql import normalize
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# Every line starts with its key, so the index is built without parsing
+_KEY_PREFIX = b'{"key":"'
+_KEY_LENGTH = 64
+
+
+class FixtureMissing(OSError):
+    """Replay mode has no recorded response for a request."""
+
+
+def request_key(method, url, key_mode, body):
+    """Hash identifying a proxy request across runs.
+
+    GraphQL bodies are compared on normalized query text, variables and
+    operation name, so whitespace and comments don't matter; any other body
+    by its bytes. The API key itself is left out (only ``key_mode``), so
+    fixtures recorded with one key replay without it.
+    """
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict) and isinstance(payload.get('query'), str):
+        content = [normalize(payload['query']), payload.get('variables') or {}, payload.get('operationName')]
+    else:
+        content = hashlib.sha256(body or b'').hexdigest()
+    canonical = json.dumps([method.upper(), url, key_mode, content], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class FixtureStore:
+    """Upstream responses kept in an append-only JSONL file.
+
+    In record mode every response the proxy gets from Zonos is appended as
+    one line: the request key and request, then status, reason, headers and
+    body. In replay mode the file is memory-mapped and indexed by key (the
+    last line for a key wins), and matching requests are answered from it,
+    after ``latency`` seconds if set, without touching the network. Lines
+    appended by another process are picked up on the next miss.
+    """
+
+    def __init__(self, path, mode, latency=0.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f'Unknown fixture mode {mode!r}')
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._index = {}  # key -> (offset, length)
+        self._map = None
+        self._indexed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    def record(self, method, url, key_mode, body, response):
+        status, reason, headers, response_body = response
+        request = {'method': method.upper(), 'url': url, 'keyMode': key_mode}
+        try:
+            request['body'] = json.loads(body) if body else None
+        except ValueError:
+            request['body'] = None
+        line = json.dumps({
+            'key': request_key(method, url, key_mode, body),
+            'request': request,
+            'status': status,
+            'reason': reason,
+            'headers': [list(h) for h in headers],
+            'body': response_body.decode('utf-8', errors='replace'),
+        }, separators=(',', ':')).encode('utf-8') + b'\n'
+        # One write per line on an O_APPEND file, so lines never interleave
+        with self._lock, open(self.path, 'ab') as f:
+            f.write(line)
+
+    def replay(self, method, url, key_mode, body):
+        """``(status, reason, headers, body)`` as recorded for this request."""
+        key = request_key(method, url, key_mode, body)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self._refresh()
+                entry = self._index.get(key)
+            if entry is None:
+                raise FixtureMissing(f'No recorded response for this request in {self.path}')
+            offset, length = entry
+            fixture = json.loads(self._map[offset:offset + length])
+        if self.latency:
+            time.sleep(self.latency)
+        return (fixture['status'], fixture['reason'], [tuple(h) for h in fixture['headers']],
+                fixture['body'].encode('utf-8'))
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._index)
+
+    def _refresh(self):
+        """Map the file again if it grew, and index the new lines."""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size <= self._indexed:
+            return
+        # Imported here: only replay reads fixtures back, and proxy cold
+        # starts outside of development never get this far
+        import mmap
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start = self._indexed
+        while start < size:
+            end = self._map.find(b'\n', start)
+            if end < 0:
+                break  # a line still being written
+            if self._map[start:start + len(_KEY_PREFIX)] == _KEY_PREFIX:
+                key_start = start + len(_KEY_PREFIX)
+                key = self._map[key_start:key_start + _KEY_LENGTH].decode('ascii', errors='replace')
+                self._index[key] = (start, end - start)
+            start = end + 1
+        self._indexed = start
+
+
+_fixtures = None
+_fixtures_lock = threading.Lock()
+
+
+def use_fixtures(path, mode, latency=0.0):
+    """Record to or replay from the fixture file at ``path`` (server.py)."""
+    global _fixtures
+    with _fixtures_lock:
+        _fixtures = FixtureStore(path, mode, latency)
+    return _fixtures
+
+
+def get_fixtures():
+    """Return the fixture store, or None when proxy calls go to Zonos as usual.
+
+    Serverless deployments set PROXY_FIXTURES (the file),
+    PROXY_FIXTURES_MODE (record or replay, default replay) and optionally
+    PROXY_FIXTURES_LATENCY_MS.
+    """
+    global _fixtures
+    if _fixtures is None:
+        path = os.environ.get('PROXY_FIXTURES', '')
+        if not path:
+            return None
+        with _fixtures_lock:
+            if _fixtures is None:
+                _fixtures = FixtureStore(path, os.environ.get('PROXY_FIXTURES_MODE', REPLAY),
+                                         float(os.environ.get('PROXY_FIXTURES_LATENCY_MS', 0)) / 1000)
+    return _fixtures
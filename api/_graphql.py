@@ -0,0 +1,182 @@
+import re
+
+# Lexical tokens of a GraphQL document; commas and whitespace are insignificant
+_TOKEN_RE = re.compile(r'''
+    (?P<skip>[\s,﻿]+|\#[^\n\r]*)
+  | (?P<block>"""(?:\\"""|(?!""").)*""")
+  | (?P<string>"(?:\\.|[^"\\\n\r])*")
+  | (?P<spread>\.\.\.)
+  | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+  | (?P<punct>[!$&()\:=@\[\]{|}])
+''', re.VERBOSE | re.DOTALL)
+
+_OPERATION_TYPES = ('query', 'mutation', 'subscription')
+
+
+class GraphQLSyntaxError(ValueError):
+    pass
+
+
+def tokenize(source):
+    """Split a GraphQL document into ``(kind, value)`` tokens."""
+    tokens = []
+    pos = 0
+    length = len(source)
+    while pos < length:
+        m = _TOKEN_RE.match(source, pos)
+        if m is None:
+            raise GraphQLSyntaxError(f'Unexpected character {source[pos]!r} at offset {pos}')
+        kind = m.lastgroup
+        if kind != 'skip':
+            tokens.append((kind, m.group()))
+        pos = m.end()
+    return tokens
+
+
+def normalize(source):
+    """Return the document with comments and insignificant whitespace removed."""
+    return ' '.join(value for _, value in tokenize(source))
+
+
+def _skip_group(tokens, i, open_char, close_char):
+    """Return the index just past the bracket group that starts at ``i``."""
+    depth = 0
+    while i < len(tokens):
+        value = tokens[i][1]
+        if tokens[i][0] == 'punct':
+            if value == open_char:
+                depth += 1
+            elif value == close_char:
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        i += 1
+    raise GraphQLSyntaxError(f'Unbalanced {open_char!r}')
+
+
+def _operation_at(tokens, i):
+    """Parse the operation starting at ``i``; returns ``(info, next_index)``."""
+    op_type, op_name = 'query', None
+    if tokens[i][0] == 'name':
+        if tokens[i][1] not in _OPERATION_TYPES:
+            raise GraphQLSyntaxError(f'Unexpected {tokens[i][1]!r}, expected an operation')
+        op_type = tokens[i][1]
+        i += 1
+        if i < len(tokens) and tokens[i][0] == 'name':
+            op_name = tokens[i][1]
+            i += 1
+    # Skip variable definitions and directives up to the selection set
+    while i < len(tokens) and tokens[i] != ('punct', '{'):
+        if tokens[i] == ('punct', '('):
+            i = _skip_group(tokens, i, '(', ')')
+        else:
+            i += 1
+    if i >= len(tokens):
+        raise GraphQLSyntaxError('Operation has no selection set')
+
+    end = _skip_group(tokens, i, '{', '}')
+    fields = []
+    i += 1
+    while i < end - 1:
+        kind, value = tokens[i]
+        if kind == 'spread':
+            # Fragment spreads and inline fragments are not root fields
+            i += 1
+            if i < end and tokens[i] == ('name', 'on'):
+                i += 2
+            elif i < end and tokens[i][0] == 'name':
+                i += 1
+        elif kind == 'name':
+            # "alias: field" selects ``field``
+            if i + 2 < end and tokens[i + 1] == ('punct', ':') and tokens[i + 2][0] == 'name':
+                i += 2
+                value = tokens[i][1]
+            fields.append(value)
+            i += 1
+            if i < end and tokens[i] == ('punct', '('):
+                i = _skip_group(tokens, i, '(', ')')
+            while i < end and tokens[i] == ('punct', '@'):
+                i += 2
+                if i < end and tokens[i] == ('punct', '('):
+                    i = _skip_group(tokens, i, '(', ')')
+            if i < end and tokens[i] == ('punct', '{'):
+                i = _skip_group(tokens, i, '{', '}')
+        elif value == '{':
+            i = _skip_group(tokens, i, '{', '}')
+        elif value == '(':
+            i = _skip_group(tokens, i, '(', ')')
+        else:
+            i += 1
+    return (op_type, op_name, fields), end
+
+
+def operations(source):
+    """Describe every operation in a GraphQL document, in order.
+
+    Returns a list of ``(operation_type, operation_name, root_fields)``; the
+    anonymous ``{ ... }`` shorthand is reported as a ``query``.
+    """
+    tokens = tokenize(source)
+    found = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == ('name', 'fragment'):
+            while i < len(tokens) and tokens[i] != ('punct', '{'):
+                i += 1
+            i = _skip_group(tokens, i, '{', '}')
+            continue
+        info, i = _operation_at(tokens, i)
+        found.append(info)
+    if not found:
+        raise GraphQLSyntaxError('Document contains no operation')
+    return found
+
+
+def operation_info(source, operation_name=None):
+    """Describe the operation a request runs: the one ``operation_name``
+    selects, or the only one in the document.
+
+    Returns ``(operation_type, operation_name, root_fields)``. Raises
+    GraphQLSyntaxError when the name matches nothing, or when a document
+    with several operations comes without one, as the server would.
+    """
+    found = operations(source)
+    if operation_name:
+        for info in found:
+            if info[1] == operation_name:
+                return info
+        raise GraphQLSyntaxError(f'No operation named {operation_name!r}')
+    if len(found) > 1:
+        raise GraphQLSyntaxError('Document has several operations; operationName must select one')
+    return found[0]
+
+
+def operation_label(source):
+    """Short name for the first operation: its name, else its root fields."""
+    op_type, op_name, fields = operations(source)[0]
+    return op_name or '+'.join(fields) or op_type
+
+
+_CLOSERS = {')': '(', ']': '[', '}': '{'}
+
+
+def validate(source):
+    """Cheap local checks before a document is sent upstream.
+
+    Catches what would otherwise cost a round trip: characters GraphQL does
+    not allow, unbalanced brackets, and a document without an operation.
+    It does not check fields or types against the schema.
+    """
+    stack = []
+    for kind, value in tokenize(source):
+        if kind != 'punct':
+            continue
+        if value in '([{':
+            stack.append(value)
+        elif value in _CLOSERS:
+            if not stack or stack.pop() != _CLOSERS[value]:
+                raise GraphQLSyntaxError(f'Unexpected {value!r}')
+    if stack:
+        raise GraphQLSyntaxError(f'Unclosed {stack[-1]!r}')
+    operations(source)
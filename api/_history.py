@@ -0,0 +1,102 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+DEFAULT_TOKEN_BUDGET = 6000
+
+# Share of the budget kept free for the rolling summary itself
+_SUMMARY_SHARE = 0.2
+
+# Per-message overhead for role markers and separators
+_MESSAGE_OVERHEAD = 4
+
+_MAX_SESSIONS = 512
+
+
+def _text(content):
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return '\n'.join(
+            block.get('text', '') for block in content if isinstance(block, dict)
+        )
+    return str(content)
+
+
+def estimate_tokens(messages):
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return sum(len(_text(m.get('content', ''))) // 4 + _MESSAGE_OVERHEAD for m in messages)
+
+
+def _message_hash(message):
+    raw = json.dumps([message.get('role'), message.get('content')], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def transcript(messages):
+    """Render messages as plain text for the summarizer."""
+    return '\n\n'.join(f"{m.get('role', 'user').title()}: {_text(m.get('content', ''))}" for m in messages)
+
+
+class HistoryManager:
+    """Keeps chat requests under a token budget.
+
+    The most recent turns are sent verbatim; anything older is folded into a
+    rolling summary that is cached per session, so each turn only summarizes
+    the messages that newly fell out of the window. Summarized messages are
+    tracked by content hash, so the client trimming the front of its history
+    does not invalidate the summary.
+    """
+
+    def __init__(self, budget=DEFAULT_TOKEN_BUDGET, max_sessions=_MAX_SESSIONS):
+        self.budget = budget
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session -> (summary, covered hashes)
+        self._lock = threading.Lock()
+
+    def _split(self, messages):
+        """Return the index where the verbatim tail starts."""
+        window = self.budget * (1 - _SUMMARY_SHARE)
+        used = 0
+        cut = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            used += estimate_tokens([messages[i]])
+            if used > window and cut < len(messages):
+                break
+            cut = i
+        # The tail has to open with a user turn
+        while cut < len(messages) - 1 and messages[cut].get('role') != 'user':
+            cut += 1
+        return cut
+
+    def compact(self, messages, summarize, session=None):
+        """Return ``(recent_messages, summary)`` for one request.
+
+        ``summarize(previous_summary, new_messages)`` produces the updated
+        summary text; if it raises, the older turns are simply dropped.
+        """
+        cut = self._split(messages)
+        older, recent = messages[:cut], messages[cut:]
+        if not older:
+            return recent, None
+
+        with self._lock:
+            summary, covered = self._sessions.get(session, (None, frozenset())) if session else (None, frozenset())
+        hashes = [_message_hash(m) for m in older]
+        fresh = [m for m, h in zip(older, hashes) if h not in covered]
+        if not fresh:
+            return recent, summary
+
+        try:
+            summary = summarize(summary, fresh)
+        except Exception:
+            return recent, summary
+
+        if session:
+            with self._lock:
+                self._sessions[session] = (summary, covered | frozenset(hashes))
+                self._sessions.move_to_end(session)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+        return recent, summary
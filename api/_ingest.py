@@ -0,0 +1,224 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+from api._store import get_store
+
+FLUSH_SIZE = 50
+FLUSH_INTERVAL = 1.0
+MAX_QUEUE = 5000
+MAX_BACKOFF = 30.0
+
+# Webhook IDs remembered per process for duplicate suppression
+MAX_SEEN = 10000
+
+
+class EventQueue:
+    """Write-behind buffer for webhook rows.
+
+    ``put`` only appends to memory, so the webhook can be acked right away.
+    Rows are written as one multi-row insert once ``flush_size`` rows are
+    waiting or the oldest has waited ``flush_interval`` seconds. A failed
+    batch stays at the head of the queue and is retried with jittered
+    exponential backoff. When the queue is full, rows overflow to an
+    optional JSONL spool file (or are dropped) and are read back once
+    there is room again.
+    """
+
+    def __init__(self, writer, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_queue=MAX_QUEUE, spool_path=None):
+        self.writer = writer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.spool_path = spool_path
+        self.dropped = 0
+        self._rows = deque()
+        self._oldest = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+    def __len__(self):
+        return len(self._rows)
+
+    def put(self, row):
+        """Queue one row; returns False if it had to be spooled or dropped."""
+        with self._cond:
+            if len(self._rows) >= self.max_queue:
+                self._overflow(row)
+                return False
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.append(row)
+            if len(self._rows) >= self.flush_size:
+                self._cond.notify()
+        return True
+
+    def _overflow(self, row):
+        if self.spool_path:
+            try:
+                with open(self.spool_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(row) + '\n')
+                return
+            except OSError:
+                pass
+        self.dropped += 1
+
+    def _reload_spool(self):
+        """Move spooled rows back into the queue while there is room."""
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return
+        with self._cond:
+            room = self.max_queue - len(self._rows)
+            if room <= 0:
+                return
+            try:
+                with open(self.spool_path, encoding='utf-8') as f:
+                    lines = f.readlines()
+            except OSError:
+                return
+            take, rest = lines[:room], lines[room:]
+            for line in take:
+                try:
+                    self._rows.append(json.loads(line))
+                except ValueError:
+                    continue
+            if self._rows and self._oldest is None:
+                self._oldest = time.monotonic()
+            with open(self.spool_path, 'w', encoding='utf-8') as f:
+                f.writelines(rest)
+
+    def due(self):
+        """True when a flush should happen now."""
+        if not self._rows or time.monotonic() < self._retry_at:
+            return False
+        return (len(self._rows) >= self.flush_size
+                or time.monotonic() - self._oldest >= self.flush_interval)
+
+    def flush(self, force=False):
+        """Write queued rows in batches; returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            self._reload_spool()
+            while self._rows and (force or self.due()):
+                with self._cond:
+                    batch = [self._rows[i] for i in range(min(self.flush_size, len(self._rows)))]
+                try:
+                    self.writer.write(batch)
+                except Exception:
+                    self._failures += 1
+                    delay = min(MAX_BACKOFF, 0.5 * 2 ** self._failures)
+                    self._retry_at = time.monotonic() + random.uniform(delay / 2, delay)
+                    break
+                with self._cond:
+                    for _ in batch:
+                        self._rows.popleft()
+                    self._oldest = time.monotonic() if self._rows else None
+                self._failures = 0
+                self._retry_at = 0.0
+                written += len(batch)
+                self._reload_spool()
+        return written
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    break
+                self._cond.wait(timeout=self.flush_interval / 2)
+            self.flush()
+        self.flush(force=True)
+
+    def start(self):
+        """Flush from a background thread (long-running servers only)."""
+        with self._cond:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='webhook-flush', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after a final flush."""
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+
+    @property
+    def background(self):
+        return self._thread is not None
+
+    def after_response(self):
+        """Called once the ack is sent.
+
+        Without a background thread (serverless, where the container may be
+        frozen as soon as the handler returns) queued rows are written now.
+        """
+        if not self.background:
+            self.flush(force=True)
+
+
+class SeenSet:
+    """The most recently seen ``max_size`` keys, least recently seen evicted.
+
+    A fast first check for redelivered webhooks; the store's unique key
+    catches the ones that have aged out or went to another instance.
+    """
+
+    def __init__(self, max_size=MAX_SEEN):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key):
+        """Remember ``key``; returns False if it was already there."""
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return False
+            self._keys[key] = None
+            if len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+        return True
+
+    def discard(self, key):
+        with self._lock:
+            self._keys.pop(key, None)
+
+
+seen = SeenSet(int(os.environ.get('WEBHOOK_SEEN_MAX', MAX_SEEN)))
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the process-wide queue, or None when rows need no queueing.
+
+    Only remote stores are queued; without a store there is nowhere to
+    write, and a local one is written to directly.
+    """
+    global _queue
+    if _queue is None:
+        store = get_store()
+        if store is None or store.local:
+            return None
+        with _queue_lock:
+            if _queue is None:
+                _queue = EventQueue(
+                    store,
+                    flush_size=int(os.environ.get('WEBHOOK_FLUSH_SIZE', FLUSH_SIZE)),
+                    flush_interval=float(os.environ.get('WEBHOOK_FLUSH_INTERVAL', FLUSH_INTERVAL)),
+                    max_queue=int(os.environ.get('WEBHOOK_MAX_QUEUE', MAX_QUEUE)),
+                    spool_path=os.environ.get('WEBHOOK_SPOOL_PATH') or None,
+                )
+    return _queue
@@ -0,0 +1,201 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Samples kept per series; quantiles describe this sliding window
+WINDOW = 1024
+
+# Distinct GraphQL operation names tracked before the rest become "other"
+MAX_OPERATIONS = 200
+
+_PREFIX = 'zonos_'
+
+_METRICS = {
+    'request_seconds': ('summary', 'Time from request received to response fully written.'),
+    'phase_seconds': ('summary', 'Time spent in one phase of handling a request.'),
+    'request_bytes': ('summary', 'Request body size.'),
+    'response_bytes': ('summary', 'Response body size as written to the client.'),
+    'requests_total': ('counter', 'Requests handled, by response status.'),
+    'proxy_coalesced_total': ('counter', 'Proxy requests answered from an identical in-flight call.'),
+    'upstream_retries_total': ('counter', 'Upstream calls retried after a transient failure.'),
+    'circuit_rejected_total': ('counter', 'Upstream calls refused while the circuit breaker was open.'),
+    'chat_cache_total': ('counter', 'Chat requests by answer cache result.'),
+    'chat_prompt_cache_tokens_total': ('counter', 'Prompt tokens read from or written to the model provider cache.'),
+    'webhook_duplicates_total': ('counter', 'Webhook deliveries dropped as redeliveries of a seen x-webhook-id.'),
+}
+
+
+class _Series:
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [(q, float('nan')) for q in QUANTILES]
+        return [(q, ordered[min(len(ordered) - 1, int(q * len(ordered)))]) for q in QUANTILES]
+
+
+class Registry:
+    """In-memory metrics for this process, rendered in Prometheus text format.
+
+    Summaries keep the last ``WINDOW`` samples of each label set so p50/p95/p99
+    follow recent traffic; ``_sum`` and ``_count`` cover the process lifetime.
+    """
+
+    def __init__(self):
+        self._series = {}  # (name, labels) -> _Series | float
+        self._operations = set()
+        self._lock = threading.Lock()
+
+    def operation_label(self, name):
+        """Bound label cardinality: operation names come from the client."""
+        if not name:
+            return ''
+        with self._lock:
+            if name in self._operations:
+                return name
+            if len(self._operations) < MAX_OPERATIONS:
+                self._operations.add(name)
+                return name
+        return 'other'
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._operations.clear()
+
+    def render(self):
+        with self._lock:
+            snapshot = [(key, value if isinstance(value, (int, float)) else
+                         (value.quantiles(), value.sum, value.count))
+                        for key, value in sorted(self._series.items())]
+        lines = []
+        described = set()
+        for (name, labels), value in snapshot:
+            full = _PREFIX + name
+            if name not in described:
+                described.add(name)
+                kind, help_text = _METRICS.get(name, ('untyped', ''))
+                lines.append(f'# HELP {full} {help_text}')
+                lines.append(f'# TYPE {full} {kind}')
+            if isinstance(value, (int, float)):
+                lines.append(f'{full}{_labels(labels)} {value}')
+                continue
+            quantiles, total, count = value
+            for q, v in quantiles:
+                lines.append(f'{full}{_labels(labels + (("quantile", str(q)),))} {v:.6g}')
+            lines.append(f'{full}_sum{_labels(labels)} {total:.6g}')
+            lines.append(f'{full}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+class RequestTimer:
+    """Timings collected while one request is handled on this thread."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.operation = ''
+        self.status = None
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.phases = []
+        self.start = time.perf_counter()
+
+    def set_operation(self, name):
+        self.operation = registry.operation_label(name)
+
+    def finish(self):
+        labels = {'endpoint': self.endpoint, 'operation': self.operation}
+        registry.observe('request_seconds', time.perf_counter() - self.start, **labels)
+        registry.observe('request_bytes', self.request_bytes, **labels)
+        registry.observe('response_bytes', self.response_bytes, **labels)
+        registry.inc('requests_total', endpoint=self.endpoint, status=str(self.status))
+        for phase, seconds in self.phases:
+            registry.observe('phase_seconds', seconds, phase=phase, **labels)
+
+
+_local = threading.local()
+
+
+def current():
+    """The RequestTimer for the request on this thread, if any."""
+    return getattr(_local, 'timer', None)
+
+
+@contextmanager
+def track(endpoint):
+    timer = _local.timer = RequestTimer(endpoint)
+    try:
+        yield timer
+    finally:
+        _local.timer = None
+        timer.finish()
+
+
+@contextmanager
+def attached(timer):
+    """Attribute work done on a helper thread to ``timer``'s request."""
+    _local.timer = timer
+    try:
+        yield
+    finally:
+        _local.timer = None
+
+
+def record(phase, seconds):
+    """Attribute ``seconds`` to ``phase`` of the current request.
+
+    Work done outside a request (background flushes) is recorded under
+    ``endpoint="background"``.
+    """
+    timer = current()
+    if timer is not None:
+        timer.phases.append((phase, seconds))
+    else:
+        registry.observe('phase_seconds', seconds, endpoint='background', operation='', phase=phase)
+
+
+@contextmanager
+def timed(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
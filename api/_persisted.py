@@ -0,0 +1,84 @@
+"""
+Registry of the sample operations the playground ships, keyed by SHA-256
+
+The browser sends ``{"extensions": {"persistedQuery": {"version": 1,
+"sha256Hash": ...}}, "variables": ...}`` for an unedited sample instead of
+the query text, and the proxy swaps the text back in. The registry is
+generated from the ``query:`` templates in index.html:
+
+  python -m api._persisted           rewrite api/persisted_queries.json
+  python -m api._persisted --check   exit 1 if it is out of date
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFEST = os.path.join(_ROOT, 'api', 'persisted_queries.json')
+
+# query: `...` entries of the sample templates in index.html
+_TEMPLATE_RE = re.compile(r'^ *query: `(.*?)`', re.MULTILINE | re.DOTALL)
+
+_registry = None
+
+
+def query_hash(source):
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def _load():
+    global _registry
+    if _registry is None:
+        try:
+            with open(MANIFEST) as f:
+                _registry = json.load(f)
+        except (OSError, ValueError):
+            _registry = {}
+    return _registry
+
+
+def lookup(sha256_hash):
+    """Query text registered under ``sha256_hash``, or None."""
+    return _load().get(sha256_hash) if isinstance(sha256_hash, str) else None
+
+
+def persisted_hash(payload):
+    """The hash a persisted-query body refers to, or None for a regular body."""
+    if not isinstance(payload, dict) or 'query' in payload:
+        return None
+    persisted = (payload.get('extensions') or {}).get('persistedQuery')
+    if not isinstance(persisted, dict):
+        return None
+    return persisted.get('sha256Hash') or ''
+
+
+def build(html):
+    return {query_hash(source): source for source in _TEMPLATE_RE.findall(html)}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    with open(os.path.join(_ROOT, 'index.html'), encoding='utf-8') as f:
+        registry = build(f.read())
+    text = json.dumps(registry, indent=2, sort_keys=True) + '\n'
+    if '--check' in argv:
+        try:
+            with open(MANIFEST, encoding='utf-8') as f:
+                current = f.read()
+        except OSError:
+            current = ''
+        if current != text:
+            print(f'{MANIFEST} is out of date; run python -m api._persisted', file=sys.stderr)
+            return 1
+        return 0
+    with open(MANIFEST, 'w', encoding='utf-8') as f:
+        f.write(text)
+    print(f'{len(registry)} queries written to {MANIFEST}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import email.utils
+import http.client
+import os
+import random
+import threading
+import time
+
+from api import _metrics
+
+# Upstream statuses worth another try: rate limiting and gateway trouble
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Statuses that count against the upstream's health (429 does not: the
+# upstream is fine, we are just sending too much)
+_FAILURE_STATUSES = {500, 502, 503, 504}
+
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 4.0
+
+# Total time one proxy request may spend upstream, retries included. Kept
+# under the serverless function limit so the client gets an answer.
+DEFAULT_DEADLINE = float(os.environ.get('PROXY_DEADLINE_SECONDS', 25))
+
+# Cap on a single attempt of a retryable request, so a hung attempt leaves
+# budget for another
+ATTEMPT_TIMEOUT = 10.0
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class CircuitOpenError(OSError):
+    """The upstream has been failing; calls are refused until ``retry_after``."""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Zonos API is unavailable right now; try again in {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class Deadline:
+    def __init__(self, seconds=None):
+        self.expires = time.monotonic() + (DEFAULT_DEADLINE if seconds is None else seconds)
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+
+class CircuitBreaker:
+    """Fail fast while an upstream is unhealthy.
+
+    Opens after ``threshold`` consecutive failures. While open every call is
+    refused; after ``reset_timeout`` seconds a single trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=15.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            return 'half-open' if time.monotonic() - self._opened_at >= self.reset_timeout else 'open'
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go ahead."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited >= self.reset_timeout and not self._trial:
+                self._trial = True
+                return
+            retry_after = max(1.0, self.reset_timeout - waited)
+        _metrics.registry.inc('circuit_rejected_total')
+        raise CircuitOpenError(retry_after)
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+# One breaker for the Zonos API, shared by every request in the process
+breaker = CircuitBreaker()
+
+
+def _status_and_headers(result):
+    if isinstance(result, tuple):  # fetch(): (status, reason, headers, body)
+        return result[0], result[2]
+    return result.status, result.headers  # StreamedResponse
+
+
+def _retry_after(headers):
+    """Seconds from a Retry-After header (delta or HTTP date), or None."""
+    value = next((v for k, v in headers if k.lower() == 'retry-after'), None)
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def call(send, deadline, idempotent, circuit=breaker):
+    """Call ``send(timeout)`` with retries, a deadline and the circuit breaker.
+
+    ``send`` returns a ``fetch`` tuple or a ``StreamedResponse``. Only
+    ``idempotent`` requests are retried, on connection errors and on the
+    statuses in RETRY_STATUSES, with jittered exponential backoff that
+    honours Retry-After. A retry that would not fit in the deadline is not
+    attempted; the last response (or error) is returned instead. The
+    breaker sees one outcome per call, after any retries.
+    """
+    circuit.allow()
+    attempts = MAX_ATTEMPTS if idempotent else 1
+    try:
+        for attempt in range(attempts):
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                raise DeadlineExceeded('Upstream deadline exceeded')
+            timeout = min(remaining, ATTEMPT_TIMEOUT) if idempotent else remaining
+            last = attempt == attempts - 1
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+            try:
+                result = send(timeout)
+            except (OSError, http.client.HTTPException):
+                if last or delay >= deadline.remaining():
+                    raise
+            else:
+                status, headers = _status_and_headers(result)
+                if status not in RETRY_STATUSES or last:
+                    break
+                delay = max(delay, _retry_after(headers) or 0.0)
+                if delay >= deadline.remaining():
+                    break
+                close = getattr(result, 'close', None)
+                if close is not None:
+                    close()
+
+            _metrics.registry.inc('upstream_retries_total')
+            time.sleep(delay)
+    except BaseException:
+        circuit.failure()
+        raise
+    if status in _FAILURE_STATUSES:
+        circuit.failure()
+    else:
+        circuit.success()
+    return result
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+# Identical requests arriving this long after a shared call finished still
+# get its result (PROXY_COALESCE_WINDOW_MS)
+DEFAULT_WINDOW = 0.1
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse identical concurrent calls into one.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is running, or up to ``window`` seconds after it succeeded, wait for
+    and share its result instead of making their own call. Failures are
+    passed to the callers already waiting but never reused after that.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return ``(result, shared)``; ``shared`` is True for followers."""
+        now = time.monotonic()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None or (call.finished_at is not None and now - call.finished_at > self.window)
+            if leader:
+                self._prune(now)
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                call.finished_at = time.monotonic()
+                if (call.error is not None or self.window <= 0) and self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def _prune(self, now):
+        expired = [k for k, c in self._calls.items()
+                   if c.finished_at is not None and now - c.finished_at > self.window]
+        for k in expired:
+            del self._calls[k]
+
+
+_DISABLED = object()
+_flights = None
+_flights_lock = threading.Lock()
+
+
+def get_flights():
+    """Return the process-wide SingleFlight, or None when coalescing is off.
+
+    On by default; serverless deployments can set PROXY_COALESCE=0 or
+    PROXY_COALESCE_WINDOW_MS.
+    """
+    global _flights
+    if _flights is None:
+        with _flights_lock:
+            if _flights is None:
+                if os.environ.get('PROXY_COALESCE', '1').lower() in ('0', 'false', 'no'):
+                    _flights = _DISABLED
+                else:
+                    window_ms = os.environ.get('PROXY_COALESCE_WINDOW_MS')
+                    _flights = SingleFlight(float(window_ms) / 1000 if window_ms else DEFAULT_WINDOW)
+    return None if _flights is _DISABLED else _flights
+
+
+def configure(window):
+    """Set the window (seconds) for server.py, or turn coalescing off with None."""
+    global _flights
+    with _flights_lock:
+        _flights = SingleFlight(window) if window is not None else _DISABLED
+    return _flights if window is not None else None
@@ -0,0 +1,182 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from urllib.parse import unquote, urlsplit
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+# Files in the site root that are served as static assets
+EXTENSIONS = {'.html', '.css', '.js', '.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico'}
+
+# Already-compressed formats are sent as they are
+_COMPRESSIBLE = {'.html', '.css', '.js', '.svg'}
+
+# Images referenced from the page get a content hash in their name
+_FINGERPRINTED = {'.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico'}
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+_QVALUE_RE = re.compile(r'^\s*q\s*=\s*([0-9.]+)\s*$')
+
+
+class Asset:
+    """One file held in memory, with every encoding prepared up front."""
+
+    def __init__(self, source, data):
+        self.source = source
+        self.mtime = os.stat(source).st_mtime_ns
+        self.content_type = mimetypes.guess_type(source)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/'):
+            self.content_type += '; charset=utf-8'
+        digest = hashlib.sha256(data).hexdigest()
+        self.fingerprint = digest[:10]
+        self.bodies = {'identity': data}
+        if os.path.splitext(source)[1].lower() in _COMPRESSIBLE:
+            self.bodies['gzip'] = gzip.compress(data, 9, mtime=0)
+            if brotli is not None:
+                self.bodies['br'] = brotli.compress(data, quality=11)
+        # Strong validators differ per encoding, since the bytes do
+        self.etags = {enc: f'"{digest[:20]}{"" if enc == "identity" else "-" + enc}"' for enc in self.bodies}
+
+    @property
+    def compressible(self):
+        return len(self.bodies) > 1
+
+    def stale(self):
+        try:
+            return os.stat(self.source).st_mtime_ns != self.mtime
+        except OSError:
+            return True
+
+
+def _accepted(header):
+    """Content codings from an Accept-Encoding header, mapped to q-values."""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        m = _QVALUE_RE.match(params) if params else None
+        if m:
+            try:
+                q = float(m.group(1))
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(asset, header):
+    """Pick the smallest encoding of ``asset`` the client accepts."""
+    if not asset.compressible:
+        return 'identity'
+    accepted = _accepted(header or '')
+    wildcard = accepted.get('*', 0.0)
+    for encoding in ('br', 'gzip'):
+        if encoding in asset.bodies and accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return 'identity'
+
+
+class StaticSite:
+    """In-memory static files for server.py.
+
+    Every asset is read and compressed (gzip, plus brotli when the package
+    is installed) once, when first needed. Images are also served under a
+    fingerprinted name (``cipher.<hash>.png``) that the page is rewritten
+    to use, so they can be cached as immutable; the page itself and the
+    plain names revalidate with a strong ETag. Editing a file on disk is
+    picked up on the next request for it.
+    """
+
+    def __init__(self, root, index='index.html'):
+        self.root = root
+        self.index = index
+        self._routes = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        routes = {}
+        renames = {}
+        names = sorted(n for n in os.listdir(self.root)
+                       if os.path.splitext(n)[1].lower() in EXTENSIONS and n != self.index)
+        for name in names:
+            source = os.path.join(self.root, name)
+            if not os.path.isfile(source):
+                continue
+            with open(source, 'rb') as f:
+                data = f.read()
+            stem, ext = os.path.splitext(name)
+            asset = Asset(source, data)
+            routes[f'/{name}'] = (asset, REVALIDATE)
+            if ext.lower() in _FINGERPRINTED:
+                renames[name] = f'{stem}.{asset.fingerprint}{ext}'
+                routes[f'/{renames[name]}'] = (asset, IMMUTABLE)
+
+        source = os.path.join(self.root, self.index)
+        with open(source, 'rb') as f:
+            page = f.read().decode('utf-8')
+        if renames:
+            # Bare file names only: "zonos-logo.png" must not match inside
+            # "zonos-logo-dark.png" or an already fingerprinted name
+            pattern = re.compile(r'(?<![\w.-])(' + '|'.join(map(re.escape, renames)) + r')(?![\w-])')
+            page = pattern.sub(lambda m: renames[m.group(1)], page)
+        routes['/'] = routes[f'/{self.index}'] = (Asset(source, page.encode('utf-8')), REVALIDATE)
+        return routes
+
+    def lookup(self, path):
+        """``(asset, cache_control)`` for a URL path, or None."""
+        routes = self._routes
+        if routes is None or any(route[0].stale() for route in (routes['/'], routes.get(path)) if route):
+            with self._lock:
+                if routes is self._routes:
+                    self._routes = self._build()
+                routes = self._routes
+        return routes.get(path)
+
+    def serve(self, handler, head=False):
+        """Answer a GET/HEAD for a static asset; returns False if there is none."""
+        path = unquote(urlsplit(handler.path).path)
+        try:
+            route = self.lookup(path)
+        except OSError:
+            return False
+        if route is None:
+            return False
+        asset, cache_control = route
+
+        encoding = negotiate(asset, handler.headers.get('Accept-Encoding'))
+        etag = asset.etags[encoding]
+        headers = [('ETag', etag), ('Cache-Control', cache_control)]
+        if asset.compressible:
+            headers.append(('Vary', 'Accept-Encoding'))
+
+        if_none_match = handler.headers.get('If-None-Match', '')
+        if if_none_match.strip() == '*' or etag in [t.strip().removeprefix('W/') for t in if_none_match.split(',')]:
+            handler.send_response(304)
+            for name, value in headers:
+                handler.send_header(name, value)
+            handler.end_headers()
+            return True
+
+        body = asset.bodies[encoding]
+        handler.send_response(200)
+        handler.send_header('Content-Type', asset.content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            handler.send_header('Content-Encoding', encoding)
+        for name, value in headers:
+            handler.send_header(name, value)
+        handler.end_headers()
+        if not head:
+            handler.wfile.write(body)
+        return True
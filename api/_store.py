@@ -0,0 +1,269 @@
+import json
+import os
+import threading
+import zlib
+
+from api._upstream import fetch
+
+# Rows returned per read unless asked otherwise
+DEFAULT_LIMIT = 50
+
+# PostgREST projection for ``fields=summary``: everything but the payload
+# and headers, plus the IDs the UI shows in its one-line summary
+SUMMARY_SELECT = ('id,session_id,event_type,received_at,source_ip,'
+                  'order_id:payload->data->order->>id,'
+                  'shipment_id:payload->data->shipment->>id')
+
+# Payload documents at least this large are stored zlib-compressed
+COMPRESS_MIN_BYTES = 256
+
+
+def summarize_row(row):
+    """Local equivalent of SUMMARY_SELECT for a full event row."""
+    payload = row.get('payload')
+    data = payload.get('data') if isinstance(payload, dict) else None
+
+    def nested_id(key):
+        obj = data.get(key) if isinstance(data, dict) else None
+        return obj.get('id') if isinstance(obj, dict) else None
+
+    summary = {k: row.get(k) for k in ('id', 'session_id', 'event_type', 'received_at', 'source_ip')}
+    summary['order_id'] = nested_id('order')
+    summary['shipment_id'] = nested_id('shipment')
+    return summary
+
+
+class SupabaseStore:
+    """The ``webhook_events`` table behind Supabase's PostgREST API.
+
+    With ``unique_ids`` (SUPABASE_WEBHOOK_IDS=1) rows keep their
+    ``webhook_id`` and redelivered events are ignored by the database.
+    That needs the column and a unique index first:
+
+        alter table webhook_events add column webhook_id text;
+        create unique index webhook_events_session_webhook_id
+            on webhook_events (session_id, webhook_id);
+    """
+
+    # Every call is a network round trip: writes go through the ingest queue
+    local = False
+
+    def __init__(self, url, key, timeout=5, unique_ids=False):
+        self.endpoint = f'{url}/rest/v1/webhook_events'
+        self.auth = {'apikey': key, 'Authorization': f'Bearer {key}'}
+        self.timeout = timeout
+        self.unique_ids = unique_ids
+
+    def write(self, rows):
+        """Insert ``rows``; returns None, as PostgREST does not report skipped duplicates."""
+        url, prefer = self.endpoint, 'return=minimal'
+        if self.unique_ids:
+            # Every row in a bulk insert needs the same keys
+            rows = [dict(row, webhook_id=row.get('webhook_id')) for row in rows]
+            url += '?on_conflict=session_id,webhook_id'
+            prefer += ',resolution=ignore-duplicates'
+        else:
+            rows = [{k: v for k, v in row.items() if k != 'webhook_id'} for row in rows]
+        status, reason, _, body = fetch(
+            'POST', url, body=json.dumps(rows).encode('utf-8'),
+            headers=dict(self.auth, **{'Content-Type': 'application/json', 'Prefer': prefer}),
+            timeout=self.timeout,
+        )
+        if status >= 300:
+            raise OSError(f'Supabase insert failed: {status} {reason} {body[:200]!r}')
+
+    def _select(self, session, since, limit, select):
+        url = (f'{self.endpoint}?session_id=eq.{session}'
+               f'&select={select}&order=id.desc&limit={limit}')
+        if since:
+            url += f'&id=gt.{int(since)}'
+        status, reason, _, body = fetch('GET', url, headers=self.auth, timeout=self.timeout)
+        if status != 200:
+            raise OSError(f'Supabase read failed: {status} {reason}')
+        return list(reversed(json.loads(body)))
+
+    def read(self, session, since=None, limit=DEFAULT_LIMIT, summary=False):
+        """Events with an id above ``since``, oldest first."""
+        return self._select(session, since, limit, SUMMARY_SELECT if summary else '*')
+
+    def latest(self, session):
+        """Id of the newest event (None if there are none)."""
+        rows = self._select(session, None, 1, 'id')
+        return rows[-1]['id'] if rows else None
+
+    def clear(self, session):
+        status, _, _, _ = fetch('DELETE', f'{self.endpoint}?session_id=eq.{session}',
+                                headers=self.auth, timeout=self.timeout)
+        if status >= 300:
+            raise OSError(f'Supabase delete failed: {status}')
+
+
+class SQLiteStore:
+    """Events in an embedded SQLite database, for server.py and single-node hosts.
+
+    The database runs in WAL mode so readers never wait for the writer, and
+    (session_id, id) is indexed, which covers every read and the
+    per-session clear. Payload and headers are kept together as one compact
+    JSON document, zlib-compressed when that makes it smaller; the IDs the
+    summary view needs are pulled out into columns at insert time. A unique
+    index on (session_id, webhook_id) makes redelivered events no-ops.
+    Ids are AUTOINCREMENT so they are never reused after a clear: clients
+    page by id and would skip a new event given an old one's id.
+    """
+
+    # Writes take microseconds, so the webhook writes through directly
+    local = True
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS webhook_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            event_type TEXT,
+            received_at TEXT NOT NULL,
+            source_ip TEXT,
+            order_id TEXT,
+            shipment_id TEXT,
+            document BLOB,
+            webhook_id TEXT
+        );
+        DROP INDEX IF EXISTS webhook_events_session_received;
+        CREATE INDEX IF NOT EXISTS webhook_events_session_id
+            ON webhook_events (session_id, id);
+    """
+    _UNIQUE_INDEX = """
+        CREATE UNIQUE INDEX IF NOT EXISTS webhook_events_session_webhook_id
+            ON webhook_events (session_id, webhook_id) WHERE webhook_id IS NOT NULL
+    """
+    _INSERT = ('INSERT OR IGNORE INTO webhook_events (session_id, event_type, received_at, source_ip, '
+               'order_id, shipment_id, document, webhook_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+    _SUMMARY_COLUMNS = 'id, session_id, event_type, received_at, source_ip, order_id, shipment_id'
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        db = self._db()
+        db.executescript(self._SCHEMA)
+        # Databases created before webhook IDs were stored
+        if 'webhook_id' not in {row['name'] for row in db.execute('PRAGMA table_info(webhook_events)')}:
+            db.execute('ALTER TABLE webhook_events ADD COLUMN webhook_id TEXT')
+        db.execute(self._UNIQUE_INDEX)
+
+    def _db(self):
+        # One connection per thread; WAL lets them read while another writes
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Imported on first use, so Supabase deployments never load it
+            import sqlite3
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def _pack(row):
+        document = json.dumps({'payload': row.get('payload'), 'headers': row.get('headers')},
+                              separators=(',', ':')).encode('utf-8')
+        if len(document) >= COMPRESS_MIN_BYTES:
+            compressed = zlib.compress(document)
+            if len(compressed) < len(document):
+                return compressed
+        return document
+
+    @staticmethod
+    def _unpack(document):
+        # A JSON document starts with "{"; anything else is zlib data
+        if document[:1] != b'{':
+            document = zlib.decompress(document)
+        return json.loads(document)
+
+    def write(self, rows):
+        """Insert ``rows``, giving each new one its ``id``; returns how many
+        were new (not redeliveries)."""
+        params = []
+        for row in rows:
+            summary = summarize_row(row)
+            params.append((row['session_id'], row.get('event_type'), row['received_at'], row.get('source_ip'),
+                           summary['order_id'], summary['shipment_id'], self._pack(row), row.get('webhook_id')))
+        # One transaction for the whole batch; sqlite3 prepares the statement once
+        inserted = 0
+        with _Transaction(self._db()) as db:
+            for row, values in zip(rows, params):
+                cursor = db.execute(self._INSERT, values)
+                if cursor.rowcount:
+                    row['id'] = cursor.lastrowid
+                    inserted += 1
+        return inserted
+
+    def read(self, session, since=None, limit=DEFAULT_LIMIT, summary=False):
+        """Events with an id above ``since``, oldest first."""
+        columns = self._SUMMARY_COLUMNS if summary else self._SUMMARY_COLUMNS + ', document'
+        rows = self._db().execute(
+            f'SELECT {columns} FROM webhook_events WHERE session_id = ? AND id > ? '
+            'ORDER BY id DESC LIMIT ?', (session, since or 0, limit),
+        ).fetchall()
+        events = []
+        for row in reversed(rows):
+            event = dict(row)
+            if not summary:
+                event.update(self._unpack(event.pop('document')))
+                del event['order_id'], event['shipment_id']
+            events.append(event)
+        return events
+
+    def latest(self, session):
+        """Id of the newest event (None if there are none)."""
+        row = self._db().execute('SELECT MAX(id) FROM webhook_events WHERE session_id = ?',
+                                 (session,)).fetchone()
+        return row[0]
+
+    def clear(self, session):
+        with _Transaction(self._db()) as db:
+            db.execute('DELETE FROM webhook_events WHERE session_id = ?', (session,))
+
+
+class _Transaction:
+    """``with`` block that runs its statements in one transaction."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN')
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def use_sqlite(path):
+    """Keep events in the SQLite database at ``path`` (created if missing)."""
+    global _store
+    with _store_lock:
+        _store = SQLiteStore(path)
+    return _store
+
+
+def get_store():
+    """Return the configured event store, or None when there is none.
+
+    EVENT_DB_PATH selects the embedded SQLite store; otherwise Supabase is
+    used when SUPABASE_URL and SUPABASE_SERVICE_KEY are set.
+    """
+    global _store
+    if _store is None:
+        db_path = os.environ.get('EVENT_DB_PATH', '')
+        supabase_url = os.environ.get('SUPABASE_URL', '')
+        supabase_key = os.environ.get('SUPABASE_SERVICE_KEY', '')
+        if not db_path and not (supabase_url and supabase_key):
+            return None
+        with _store_lock:
+            if _store is None:
+                _store = SQLiteStore(db_path) if db_path else SupabaseStore(
+                    supabase_url, supabase_key, unique_ids=os.environ.get('SUPABASE_WEBHOOK_IDS') == '1')
+    return _store
@@ -0,0 +1,267 @@
+import http.client
+import os
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from api import _metrics
+
+# The only upstream the proxy is allowed to talk to
+ALLOWED_HOST = 'api.zonos.com'
+
+# Errors that mean a pooled keep-alive socket was closed by the server while idle
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+# Methods that may be sent again when a reused socket dies before the response
+# arrives; the server may already have acted on anything else
+_IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+# Connection-scoped headers that must not be relayed by a proxy
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'transfer-encoding', 'upgrade',
+}
+
+CHUNK_SIZE = 64 * 1024
+
+# Set by the proxy's own send_response, or replaced by its own CORS headers
+_OWN_HEADERS = {'server', 'date'}
+
+_ssl_context = None
+_ssl_lock = threading.Lock()
+
+
+def ssl_context():
+    """Return the process-wide SSL context (CA bundle is loaded only once)."""
+    global _ssl_context
+    if _ssl_context is None:
+        with _ssl_lock:
+            if _ssl_context is None:
+                _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+class _TimedHTTPConnection(http.client.HTTPConnection):
+    def connect(self):
+        with _metrics.timed('upstream_connect'):
+            super().connect()
+
+
+class _TimedHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPSConnection that reports TCP connect and TLS handshake separately."""
+
+    def connect(self):
+        with _metrics.timed('upstream_connect'):
+            http.client.HTTPConnection.connect(self)
+        server_hostname = self._tunnel_host or self.host
+        with _metrics.timed('upstream_tls'):
+            self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname)
+
+
+class ConnectionPool:
+    """Bounded pool of keep-alive HTTP(S) connections to a single host.
+
+    Idle connections are reused LIFO so the warmest socket is picked first,
+    connections idle longer than ``idle_timeout`` are closed instead of reused,
+    and a request that fails on a reused socket is retried once on a fresh one:
+    always if it could not be sent, and only for idempotent methods if the
+    socket died while waiting for the response.
+    """
+
+    def __init__(self, host, port=443, maxsize=8, idle_timeout=55.0, https=True):
+        self.host = host
+        self.port = port
+        self.https = https
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._idle = []  # [(conn, last_used)]
+        self._lock = threading.Lock()
+
+    def _new_conn(self, timeout):
+        if not self.https:
+            return _TimedHTTPConnection(self.host, self.port, timeout=timeout)
+        return _TimedHTTPSConnection(
+            self.host, self.port, timeout=timeout, context=ssl_context()
+        )
+
+    def _get(self, timeout):
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, last_used = self._idle.pop()
+                if now - last_used < self.idle_timeout:
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+        return self._new_conn(timeout), False
+
+    def _put(self, conn):
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def clear(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+    @contextmanager
+    def request(self, method, path, body=None, headers=None, timeout=30):
+        """Send a request and yield the live ``http.client.HTTPResponse``.
+
+        The connection goes back to the pool on exit if the body was fully read
+        and the server did not ask to close it; otherwise it is discarded.
+        """
+        headers = dict(headers or {})
+        start = time.perf_counter()
+        conn, reused = self._get(timeout)
+        sent = False
+        try:
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                sent = True
+                response = conn.getresponse()
+            except _STALE_ERRORS:
+                conn.close()
+                if not reused or (sent and method.upper() not in _IDEMPOTENT_METHODS):
+                    raise
+                conn = self._new_conn(timeout)
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+        except BaseException:
+            conn.close()
+            raise
+        # Time to first byte includes connecting when no idle socket was free
+        _metrics.record('upstream_ttfb', time.perf_counter() - start)
+
+        try:
+            yield response
+        except BaseException:
+            conn.close()
+            raise
+        finally:
+            _metrics.record('upstream_total', time.perf_counter() - start)
+        if response.isclosed() and not response.will_close:
+            self._put(conn)
+        else:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _connect_target(host, port, https):
+    """Where to actually connect for an origin.
+
+    ZONOS_UPSTREAM (e.g. ``http://127.0.0.1:9000``) sends api.zonos.com
+    traffic to a stand-in server, for benchmarks and local testing.
+    """
+    override = os.environ.get('ZONOS_UPSTREAM', '')
+    if host != ALLOWED_HOST or not override:
+        return host, port, https
+    parts = urlsplit(override)
+    https = parts.scheme == 'https'
+    return parts.hostname, parts.port or (443 if https else 80), https
+
+
+def get_pool(host, port=443, https=True):
+    """Return the module-level pool for an origin, creating it on first use."""
+    key = (host, port, https)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                target_host, target_port, target_https = _connect_target(host, port, https)
+                pool = _pools[key] = ConnectionPool(target_host, target_port, https=target_https)
+    return pool
+
+
+def _split(url):
+    """Return ``(pool, path)`` for an absolute URL."""
+    parts = urlsplit(url)
+    https = parts.scheme == 'https'
+    port = parts.port or (443 if https else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    return get_pool(parts.hostname, port, https), path
+
+
+@contextmanager
+def stream(method, url, body=None, headers=None, timeout=30):
+    """Like ``fetch`` but yield the unread ``http.client.HTTPResponse``."""
+    pool, path = _split(url)
+    with pool.request(method, path, body, headers, timeout) as response:
+        yield response
+
+
+class StreamedResponse:
+    """An upstream response whose body is read lazily by iterating over it.
+
+    The connection goes back to the pool on ``close`` once the body has been
+    read to the end, and is discarded if the reader stopped early.
+    """
+
+    def __init__(self, context, response):
+        self._context = context
+        self._response = response
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.getheaders()
+
+    def __iter__(self):
+        while True:
+            chunk = self._response.read1(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        context, self._context = self._context, None
+        if context is not None:
+            context.__exit__(None, None, None)
+
+
+def open_stream(method, url, body=None, headers=None, timeout=30):
+    """Send a request and return a ``StreamedResponse`` once headers arrive."""
+    context = stream(method, url, body, headers, timeout)
+    return StreamedResponse(context, context.__enter__())
+
+
+def relay_headers(headers):
+    """Yield the upstream ``(name, value)`` pairs a proxy should pass on."""
+    for name, value in headers:
+        lower = name.lower()
+        if (lower in HOP_BY_HOP_HEADERS or lower in _OWN_HEADERS
+                or lower.startswith('access-control-')):
+            continue
+        yield name, value
+
+
+def fetch(method, url, body=None, headers=None, timeout=30):
+    """Perform a request over the shared pool and read the whole response.
+
+    Returns ``(status, reason, headers, body_bytes)`` where ``headers`` is a
+    list of ``(name, value)`` pairs.  Connection-level failures raise
+    ``OSError`` or ``http.client.HTTPException``.
+    """
+    pool, path = _split(url)
+    with pool.request(method, path, body, headers, timeout) as response:
+        data = response.read()
+        return response.status, response.reason, response.getheaders(), data
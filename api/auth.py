@@ -1,40 +1,30 @@
-import json
-import os
-from http.server import BaseHTTPRequestHandler
+from api._access import TOKEN_TTL, auth_limiter, check_code, issue_token
+from api._core import Endpoint, HTTPError, json_response
 
-ALLOWED_ORIGIN = 'https://zonos-api-demo.vercel.app'
 
+def post(request):
+    """Exchange the access code for a session token.
 
-class handler(BaseHTTPRequestHandler):
-    def _cors_headers(self):
-        self.send_header('Access-Control-Allow-Origin', ALLOWED_ORIGIN)
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+    Wrong guesses are rate limited per client IP; the token goes back to
+    /proxy and /chat as ``Authorization: Bearer <token>``.
+    """
+    client = request.client_ip or 'local'
+    allowed, retry_after = auth_limiter.check(client)
+    if not allowed:
+        raise HTTPError(429, {'ok': False, 'error': 'Too many attempts'},
+                        {'Retry-After': str(int(retry_after) + 1)})
 
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self._cors_headers()
-        self.end_headers()
+    try:
+        code = request.json().get('code', '')
+    except Exception:
+        raise HTTPError(400, {'ok': False})
 
-    def do_POST(self):
-        try:
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length)
-            data = json.loads(body)
-            code = data.get('code', '')
-        except Exception:
-            self.send_response(400)
-            self.send_header('Content-Type', 'application/json')
-            self._cors_headers()
-            self.end_headers()
-            self.wfile.write(json.dumps({'ok': False}).encode())
-            return
+    if not check_code(code):
+        auth_limiter.charge(client)
+        return json_response({'ok': False})
+    return json_response({'ok': True, 'token': issue_token(), 'expiresIn': TOKEN_TTL},
+                         headers={'Cache-Control': 'no-store'})
 
-        expected = os.environ.get('DEMO_ACCESS_CODE', '')
-        ok = bool(expected and code == expected)
 
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self._cors_headers()
-        self.end_headers()
-        self.wfile.write(json.dumps({'ok': ok}).encode())
+endpoint = Endpoint({'POST': post}, expose_headers='Retry-After')
+handler = endpoint.handler_class()
@@ -1,9 +1,18 @@
-import json
 import os
-from http.server import BaseHTTPRequestHandler
-import anthropic
+import threading
+import time
 
-ALLOWED_ORIGIN = 'https://zonos-api-demo.vercel.app'
+from api import _metrics
+from api._access import authorized
+from api._answers import CACHE_HEADER, get_answers
+from api._core import Endpoint, event_stream, json_response, sse_frame
+from api._history import DEFAULT_TOKEN_BUDGET, HistoryManager, estimate_tokens, transcript
+
+MODEL = 'claude-haiku-4-5-20251001'
+
+# Shortest prompt prefix MODEL will cache; a cache_control breakpoint on a
+# shorter prefix is accepted but silently creates no cache entry
+MIN_CACHEABLE_TOKENS = 4096
 
 SYSTEM_PROMPT = """You are a helpful assistant for the Zonos API Playground — a demo tool used by Zonos onboarding specialists to explain the Zonos API to new merchants.
 
@@ -87,66 +96,194 @@ Variables from different contexts cannot be mixed in a single rule.
 ## Tone & Length
 Be helpful, friendly, and **brief**. Keep answers to 2-4 sentences whenever possible. Avoid bullet-point walls — use them only when listing 3+ distinct items. Skip preamble like "Great question!" or lengthy intros. If someone needs more detail they'll ask."""
 
+_SUMMARY_HEADER = '## Earlier in This Conversation\nSummary of earlier turns that are no longer included verbatim:\n'
+
+_SUMMARIZE_PROMPT = 'Update the running summary of a chat between a Zonos onboarding specialist and an assistant. Keep facts, IDs, decisions and open questions; drop pleasantries. Reply with the summary only, under 200 words.'
+
+_CUSTOM_CONTEXT_HEADER = '## Additional Context Taught by User\nThe following was added by the user. Use it to supplement your answers, but if anything below contradicts your built-in Zonos knowledge, trust your built-in knowledge and politely note the discrepancy.\n'
+
+# One client per warm container so its HTTP connection pool is reused.
+# The SDK takes ~0.5 s to import, so it is only loaded once a chat request
+# actually needs it; preflights and validation errors never pay for it.
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+
+def _get_client(api_key):
+    global _client, _client_key
+    with _client_lock:
+        if _client is None or _client_key != api_key:
+            import anthropic
+            _client = anthropic.Anthropic(api_key=api_key)
+            _client_key = api_key
+        return _client
+
+
+# Token budget for the messages of one request; older turns are summarized
+_history = HistoryManager(int(os.environ.get('CHAT_HISTORY_TOKEN_BUDGET', DEFAULT_TOKEN_BUDGET)))
+
+
+def _system_blocks(custom_context, summary=None):
+    """Build the system prompt as content blocks.
+
+    The static SYSTEM_PROMPT comes first and is kept byte-identical across
+    requests, followed by the per-user taught context and the conversation
+    summary, so every request shares the longest possible prefix.
+    """
+    blocks = [{'type': 'text', 'text': SYSTEM_PROMPT}]
+    if custom_context:
+        blocks.append({'type': 'text', 'text': _CUSTOM_CONTEXT_HEADER + custom_context})
+    if summary:
+        blocks.append({'type': 'text', 'text': _SUMMARY_HEADER + summary})
+    return blocks
+
+
+def _with_cache_control(content):
+    if isinstance(content, str):
+        content = [{'type': 'text', 'text': content}]
+    content = [dict(block) for block in content]
+    content[-1]['cache_control'] = {'type': 'ephemeral'}
+    return content
+
+
+def _mark_cache_breakpoints(system, messages):
+    """Add prompt cache breakpoints where the prefix is long enough to cache.
+
+    SYSTEM_PROMPT alone (~1.4k tokens) is below MIN_CACHEABLE_TOKENS, so a
+    breakpoint there would never hit. Instead one goes on the last system
+    block when a large taught context brings the system prompt past the
+    minimum, and one on the last earlier turn of a conversation long enough,
+    so the next turn reads everything before its new question from the
+    cache. Returns ``(system, messages)`` with copies of the marked parts.
+    """
+    prefix = sum(len(block['text']) // 4 for block in system)
+    if prefix >= MIN_CACHEABLE_TOKENS:
+        system = system[:-1] + [dict(system[-1], cache_control={'type': 'ephemeral'})]
+    if len(messages) > 1 and prefix + estimate_tokens(messages[:-1]) >= MIN_CACHEABLE_TOKENS:
+        last = messages[-2]
+        messages = messages[:-2] + [dict(last, content=_with_cache_control(last.get('content', ''))),
+                                    messages[-1]]
+    return system, messages
+
+
+def _record_usage(usage):
+    """Count prompt cache reads and writes reported by the API."""
+    for kind, field in (('read', 'cache_read_input_tokens'), ('write', 'cache_creation_input_tokens')):
+        tokens = getattr(usage, field, None)
+        if tokens:
+            _metrics.registry.inc('chat_prompt_cache_tokens_total', tokens, kind=kind)
+
+
+def _summarize(client, previous, new_messages):
+    text = transcript(new_messages)
+    if previous:
+        text = f'Current summary:\n{previous}\n\nNew turns:\n{text}'
+    with _metrics.timed('summarize'):
+        response = client.messages.create(
+            model=MODEL,
+            max_tokens=400,
+            system=_SUMMARIZE_PROMPT,
+            messages=[{'role': 'user', 'content': text}]
+        )
+    return response.content[0].text
+
+
+def _standalone_question(messages):
+    """The question of a one-message conversation, the only kind whose
+    answer does not depend on earlier turns (else None)."""
+    if len(messages) != 1 or not isinstance(messages[0], dict):
+        return None
+    message = messages[0]
+    if message.get('role') != 'user' or not isinstance(message.get('content'), str):
+        return None
+    return message['content']
+
+
+def post(request):
+    if not authorized(request):
+        return json_response({'error': 'Session expired, enter the access code again'}, 401)
+
+    request_data = request.json()
+
+    messages = request_data.get('messages', [])
+    custom_context = request_data.get('context', '')
+    if not messages:
+        return json_response({'error': 'No messages provided'}, 400)
+
+    api_key = os.environ.get('ANTHROPIC_API_KEY', '')
+    if not api_key:
+        return json_response({'error': 'Chat service not configured'}, 500)
+
+    # Repeated stand-alone questions are answered from the local cache;
+    # "cache": false in the request skips it
+    answers = get_answers() if request_data.get('cache', True) else None
+    question = _standalone_question(messages) if answers is not None else None
+    cached = answers.get(question, custom_context) if question else None
+    headers = {CACHE_HEADER: 'HIT' if cached else 'MISS' if question else 'BYPASS'}
+    _metrics.registry.inc('chat_cache_total', result=headers[CACHE_HEADER].lower())
+    if cached:
+        if request_data.get('stream'):
+            return event_stream([sse_frame('delta', {'text': cached}), sse_frame('done', {'reply': cached})],
+                                headers)
+        return json_response({'reply': cached}, headers=headers)
+    remember = (lambda reply: answers.set(question, reply, custom_context)) if question else None
+
+    client = _get_client(api_key)
+    messages, summary = _history.compact(
+        messages,
+        lambda previous, new: _summarize(client, previous, new),
+        session=request_data.get('session'),
+    )
+    system, messages = _mark_cache_breakpoints(_system_blocks(custom_context, summary), messages)
+    params = dict(
+        model=MODEL,
+        max_tokens=1024,
+        system=system,
+        messages=messages
+    )
+
+    if request_data.get('stream'):
+        return event_stream(_stream_reply(client, params, remember), headers)
+
+    with _metrics.timed('model_total'):
+        response = client.messages.create(**params)
+    _record_usage(response.usage)
+
+    reply = response.content[0].text
+    if remember is not None:
+        remember(reply)
+    return json_response({'reply': reply}, headers=headers)
+
+
+def _stream_reply(client, params, remember=None):
+    """Yield the reply as server-sent events: a ``delta`` per text chunk,
+    then ``done`` with the full reply (or ``error``). A complete reply is
+    passed to ``remember``.
+
+    If the browser goes away the generator is closed, which leaves the
+    ``with`` block and closes the upstream stream so the model stops
+    generating tokens nobody will read.
+    """
+    parts = []
+    start = time.perf_counter()
+    try:
+        with client.messages.stream(**params) as stream:
+            for text in stream.text_stream:
+                if not parts:
+                    _metrics.record('model_ttfb', time.perf_counter() - start)
+                parts.append(text)
+                yield sse_frame('delta', {'text': text})
+            _record_usage(stream.get_final_message().usage)
+        _metrics.record('model_total', time.perf_counter() - start)
+    except Exception:
+        yield sse_frame('error', {'error': 'Internal error'})
+        return
+    reply = ''.join(parts)
+    if remember is not None:
+        remember(reply)
+    yield sse_frame('done', {'reply': reply})
+
 
-class handler(BaseHTTPRequestHandler):
-    def _cors_headers(self):
-        self.send_header('Access-Control-Allow-Origin', ALLOWED_ORIGIN)
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self._cors_headers()
-        self.end_headers()
-
-    def do_POST(self):
-        try:
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length)
-            request_data = json.loads(body)
-
-            messages = request_data.get('messages', [])
-            custom_context = request_data.get('context', '')
-            if not messages:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self._cors_headers()
-                self.end_headers()
-                self.wfile.write(json.dumps({'error': 'No messages provided'}).encode())
-                return
-
-            api_key = os.environ.get('ANTHROPIC_API_KEY', '')
-            if not api_key:
-                self.send_response(500)
-                self.send_header('Content-Type', 'application/json')
-                self._cors_headers()
-                self.end_headers()
-                self.wfile.write(json.dumps({'error': 'Chat service not configured'}).encode())
-                return
-
-            system = SYSTEM_PROMPT
-            if custom_context:
-                system += f'\n\n## Additional Context Taught by User\nThe following was added by the user. Use it to supplement your answers, but if anything below contradicts your built-in Zonos knowledge, trust your built-in knowledge and politely note the discrepancy.\n{custom_context}'
-
-            client = anthropic.Anthropic(api_key=api_key)
-            response = client.messages.create(
-                model='claude-haiku-4-5-20251001',
-                max_tokens=1024,
-                system=system,
-                messages=messages
-            )
-
-            reply = response.content[0].text
-
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self._cors_headers()
-            self.end_headers()
-            self.wfile.write(json.dumps({'reply': reply}).encode())
-
-        except Exception:
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self._cors_headers()
-            self.end_headers()
-            self.wfile.write(json.dumps({'error': 'Internal error'}).encode())
+endpoint = Endpoint({'POST': post}, allow_headers='Content-Type, Authorization', expose_headers=CACHE_HEADER)
+handler = endpoint.handler_class()
@@ -0,0 +1,27 @@
+import hmac
+import os
+
+from api._core import Endpoint, Response, json_response
+from api._metrics import registry
+
+
+def get(request):
+    """Latency and size metrics in Prometheus text format.
+
+    Metrics live in process memory, so on Vercel each warm container reports
+    only the requests it served itself. Set METRICS_TOKEN to require
+    ``Authorization: Bearer <token>``.
+    """
+    token = os.environ.get('METRICS_TOKEN', '')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return json_response({'error': 'Unauthorized'}, 401)
+
+    return Response(
+        registry.render().encode(),
+        headers={'Cache-Control': 'no-store'},
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+endpoint = Endpoint({'GET': get}, allow_headers='Content-Type, Authorization')
+handler = endpoint.handler_class()
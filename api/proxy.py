@@ -1,152 +1,562 @@
+import binascii
+import hashlib
+import http.client
 import json
 import os
-import urllib.request
-import urllib.error
-import ssl
-from http.server import BaseHTTPRequestHandler
+import re
+import time
 from urllib.parse import urlparse as _urlparse
 
+from api import _metrics
+from api._access import authorized
+from api._cache import CACHE_HEADER, coalesce_key, get_cache, is_cacheable_response, request_key
+from api._core import Endpoint, HTTPError, Response, json_response
+from api._fixtures import get_fixtures
+from api._graphql import GraphQLSyntaxError, normalize, operation_label, validate
+from api._persisted import lookup as lookup_persisted, persisted_hash
+from api._resilience import CircuitOpenError, Deadline, call as call_upstream
+from api._singleflight import get_flights
 # Only allow proxying to Zonos API endpoints
-_ALLOWED_HOST = 'api.zonos.com'
-
-ALLOWED_ORIGIN = 'https://zonos-api-demo.vercel.app'
+from api._upstream import ALLOWED_HOST as _ALLOWED_HOST, fetch, open_stream, relay_headers
 
 # Headers from upstream responses that should never be forwarded to the client
 _STRIP_HEADERS = {'set-cookie', 'authorization', 'www-authenticate', 'x-api-key'}
 
+_PROXY_ERROR = {'X-Proxy-Error': '1'}
+
+# Set on responses that were shared with an identical in-flight request
+COALESCED_HEADER = 'X-Proxy-Coalesced'
+
+# Largest image accepted by the vision upload path (the browser downscales
+# photos well below this before uploading)
+VISION_MAX_BYTES = 10 * 1024 * 1024
+
+_VISION_QUERY = """mutation ItemsExtract($input: ItemsExtractInput!) {
+  itemsExtract(input: $input) {
+    id
+    quantity
+    content { name description materials language }
+    classification { confidenceScore hsCode { code } }
+    valueEstimation { currency value valueEstimateRange { high low } }
+  }
+}"""
+
+# Operations accepted in one batch, and how many run upstream at once
+MAX_BATCH = 10
+BATCH_WORKERS = 4
+
+# {{id.path.to.value}}: a value from the response of an earlier operation
+_REF_RE = re.compile(r'\{\{\s*([A-Za-z_][\w-]*)((?:\.[\w-]+)*)\s*\}\}')
+
+# Sample-query placeholders the user is meant to replace before running
+_PLACEHOLDER_RE = re.compile(r'PASTE_YOUR_\w+_HERE')
+
+# Stands in for the image while the variables are serialized; the base64
+# data is spliced in afterwards so the image itself is never JSON-encoded
+_IMAGE_SLOT = '__IMAGE_BASE64__'
+
+
+def _operation(payload):
+    """GraphQL operation name of a proxied body, for metrics labels."""
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return ''
+    if not isinstance(payload, dict) or not isinstance(payload.get('query'), str):
+        return ''
+    try:
+        return payload.get('operationName') or operation_label(payload['query'])
+    except GraphQLSyntaxError:
+        return 'invalid'
+
+
+def _expand_persisted(payload):
+    """Swap a persisted-query reference for the registered query text."""
+    sha256_hash = persisted_hash(payload)
+    if sha256_hash is None:
+        return payload
+    source = lookup_persisted(sha256_hash)
+    if source is None:
+        raise HTTPError(400, {'error': True, 'code': 'PERSISTED_QUERY_NOT_FOUND',
+                              'message': 'Unknown persisted query; send the query text instead'}, _PROXY_ERROR)
+    expanded = {k: v for k, v in payload.items() if k != 'extensions'}
+    expanded['query'] = source
+    return expanded
+
+
+def _check_query(payload):
+    """Reject GraphQL that could only fail upstream: bad syntax or unfilled placeholders."""
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return
+    if not isinstance(payload, dict) or not isinstance(payload.get('query'), str):
+        return
+    try:
+        validate(payload['query'])
+    except GraphQLSyntaxError as e:
+        raise HTTPError(400, {'error': True, 'message': f'Invalid GraphQL: {e}'}, _PROXY_ERROR)
+    # Placeholders mentioned in comments are fine; normalize() drops those
+    placeholder = _PLACEHOLDER_RE.search(json.dumps([normalize(payload['query']), payload.get('variables')]))
+    if placeholder:
+        raise HTTPError(400, {'error': True, 'message': f'Replace {placeholder.group()} with a real value '
+                                                        'before running this query'}, _PROXY_ERROR)
+
+
+def _check_target(target_url):
+    if not target_url:
+        raise HTTPError(400, {'error': True, 'message': 'Missing URL'}, _PROXY_ERROR)
+    _parsed = _urlparse(target_url)
+    if _parsed.scheme != 'https' or _parsed.netloc != _ALLOWED_HOST:
+        raise HTTPError(400, {'error': True, 'message': 'Disallowed target URL'}, _PROXY_ERROR)
+
+
+def _use_server_key(headers, key_mode):
+    """Use server-side API key based on keyMode (never trust client-supplied credentialToken)."""
+    headers.pop('credentialToken', None)  # always strip any client-supplied key
+    if key_mode == 'live':
+        server_key = os.environ.get('ZONOS_LIVE_API_KEY', '')
+    else:
+        server_key = os.environ.get('ZONOS_API_KEY', '')
+    if server_key:
+        headers['credentialToken'] = server_key
+
+
+def _cache_lookup(use_cache, target_url, method, key_mode, payload):
+    """Return ``(cache_key, ttl, cached, extra_headers)`` for a request."""
+    # Opt-in response cache for side-effect-free operations
+    cache = get_cache()
+    cache_key = ttl = cached = None
+    if cache is not None and use_cache:
+        cache_key, ttl = request_key(target_url, method, key_mode, payload)
+        if cache_key:
+            cached = cache.get(cache_key)
+    extra = {}
+    if cache is not None:
+        extra[CACHE_HEADER] = 'HIT' if cached else 'MISS' if cache_key else 'BYPASS'
+    return cache_key, ttl, cached, extra
+
+
+def _upstream_error(e, stream):
+    """Response for a request that never got an answer from Zonos.
+
+    Stream mode reports with an HTTP status and X-Proxy-Error; envelope mode
+    keeps its usual 200 with ``error`` set. An open circuit also says when
+    to try again.
+    """
+    headers = dict(_PROXY_ERROR) if stream else {}
+    if isinstance(e, CircuitOpenError):
+        retry_after = max(1, round(e.retry_after))
+        headers['Retry-After'] = str(retry_after)
+        return json_response({'error': True, 'message': str(e), 'retryAfter': retry_after},
+                             503 if stream else 200, headers)
+    return json_response({'error': True, 'message': f'Connection failed: {str(e)}'},
+                         502 if stream else 200, headers)
+
+
+def _fetch(method, target_url, req_body, headers, cached, cache_key, ttl, flight_key=None, deadline=None,
+           key_mode='test', fixture_body=None):
+    """Return ``((status, reason, headers, body), shared)`` from the cache or Zonos.
+
+    With a ``flight_key``, identical concurrent requests share one upstream
+    call and ``shared`` is True for all but the first. Only those (queries)
+    are retried; every call is bounded by ``deadline`` and refused while the
+    circuit breaker is open. With fixtures configured, responses are
+    recorded, or replayed instead of calling Zonos at all; they are keyed
+    on ``fixture_body`` when given, else on ``req_body``.
+    """
+    if cached:
+        return cached, False
+    deadline = deadline or Deadline()
+    fixtures = get_fixtures()
+    if fixture_body is None:
+        fixture_body = req_body
+
+    def call():
+        if fixtures is not None and fixtures.replaying:
+            response = fixtures.replay(method, target_url, key_mode, fixture_body)
+        else:
+            response = call_upstream(
+                lambda timeout: fetch(method, target_url, body=req_body, headers=headers, timeout=timeout),
+                deadline, idempotent=flight_key is not None)
+            if fixtures is not None:
+                fixtures.record(method, target_url, key_mode, fixture_body, response)
+        status_code, _, _, response_body = response
+        if cache_key and is_cacheable_response(status_code, response_body):
+            get_cache().set(cache_key, response, len(response_body), ttl)
+        return response
+
+    flights = get_flights() if flight_key else None
+    if flights is None:
+        return call(), False
+    response, shared = flights.do(flight_key, call)
+    if shared:
+        _metrics.registry.inc('proxy_coalesced_total')
+    return response, shared
+
+
+def get(request):
+    return json_response({
+        'hasKey': bool(os.environ.get('ZONOS_API_KEY', '')),
+        'hasLiveKey': bool(os.environ.get('ZONOS_LIVE_API_KEY', ''))
+    })
+
+
+def post(request):
+    if not authorized(request):
+        raise HTTPError(401, {'error': True, 'message': 'Session expired, enter the access code again'}, _PROXY_ERROR)
+
+    content_type = request.headers.get('Content-Type', '')
+    if content_type.startswith(('multipart/form-data', 'image/')):
+        return _vision(request, content_type)
+
+    request_data = request.json()
+
+    if 'batch' in request_data:
+        return _batch(request_data)
+
+    target_url = request_data.get('url')
+    method = request_data.get('method', 'GET')
+    headers = request_data.get('headers', {})
+    payload = _expand_persisted(request_data.get('body'))
+
+    timer = _metrics.current()
+    if timer is not None:
+        timer.set_operation(_operation(payload))
+
+    _check_target(target_url)
+    _check_query(payload)
+
+    req_body = None
+    if payload:
+        if isinstance(payload, dict):
+            req_body = json.dumps(payload).encode('utf-8')
+        else:
+            req_body = payload.encode('utf-8')
+
+    key_mode = request_data.get('keyMode', 'test')
+    _use_server_key(headers, key_mode)
+
+    cache_key, ttl, cached, extra = _cache_lookup(
+        request_data.get('cache', True), target_url, method, key_mode, payload)
+    flight_key = None if cached else coalesce_key(target_url, method, key_mode, payload)
+
+    # Queries are buffered only to be shared with identical ones, so they
+    # stream too when coalescing is off. Fixtures hold whole responses, so
+    # streams are read in one piece then
+    coalesced = flight_key is not None and get_flights() is not None
+    if request_data.get('stream') and not coalesced and get_fixtures() is None:
+        return _proxy_stream(method, target_url, req_body, headers, cached, cache_key, ttl, extra,
+                             idempotent=flight_key is not None)
+
+    try:
+        (status_code, reason, upstream_headers, response_body), shared = _fetch(
+            method, target_url, req_body, headers, cached, cache_key, ttl, flight_key, key_mode=key_mode)
+    except (OSError, http.client.HTTPException) as e:
+        return _upstream_error(e, request_data.get('stream'))
+    if shared:
+        extra[COALESCED_HEADER] = '1'
+
+    if request_data.get('stream'):
+        # Coalesced queries are small (and fixtures whole); relay the body in one piece
+        return Response(response_body, status_code, _passthrough_headers(upstream_headers, extra))
+
+    # Strip sensitive headers before returning to client
+    safe_headers = {
+        k: v for k, v in upstream_headers
+        if k.lower() not in _STRIP_HEADERS
+    }
+
+    return json_response({
+        'status': status_code,
+        'statusText': reason,
+        'headers': safe_headers,
+        'body': response_body.decode('utf-8')
+    }, headers=extra)
 
-class handler(BaseHTTPRequestHandler):
-    def _cors_headers(self):
-        self.send_header('Access-Control-Allow-Origin', ALLOWED_ORIGIN)
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self._cors_headers()
-        self.end_headers()
-
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self._cors_headers()
-        self.end_headers()
-        result = {
-            'hasKey': bool(os.environ.get('ZONOS_API_KEY', '')),
-            'hasLiveKey': bool(os.environ.get('ZONOS_LIVE_API_KEY', ''))
-        }
-        self.wfile.write(json.dumps(result).encode())
-
-    def do_POST(self):
+
+def _batch(request_data):
+    """Run several GraphQL operations in one round trip.
+
+    ``batch`` is a list of ``{id, body, url?, keyMode?, cache?}``; ``url``
+    and ``keyMode`` default to the top-level ones. A ``{{id.path}}``
+    placeholder in a query or variable takes a value from the response of
+    an earlier operation (``{{order.data.orderCreate.id}}``), which makes
+    the later operation wait for it. Everything else runs concurrently.
+    Results come back in request order as ``{id, status, statusText, body}``,
+    or ``{id, error, message}`` if the operation could not run.
+    """
+    operations = request_data['batch']
+    if not isinstance(operations, list) or not 0 < len(operations) <= MAX_BATCH:
+        raise HTTPError(400, {'error': True, 'message': f'batch must list 1-{MAX_BATCH} operations'}, _PROXY_ERROR)
+
+    timer = _metrics.current()
+    if timer is not None:
+        timer.set_operation('batch')
+
+    plan = []
+    seen = set()
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict) or not isinstance(op.get('body'), (dict, str)):
+            raise HTTPError(400, {'error': True, 'message': f'Operation {index} has no body'}, _PROXY_ERROR)
+        op_id = str(op.get('id', index))
+        if op_id in seen:
+            raise HTTPError(400, {'error': True, 'message': f'Duplicate operation id {op_id!r}'}, _PROXY_ERROR)
+        url = op.get('url') or request_data.get('url')
+        _check_target(url)
+        body = _expand_persisted(op['body'])
+        deps = {m.group(1) for m in _REF_RE.finditer(json.dumps(body))}
+        if not deps <= seen:
+            missing = ', '.join(sorted(deps - seen))
+            raise HTTPError(400, {'error': True, 'message': f'Operation {op_id!r} refers to {missing}, '
+                                                              'which must come earlier in the batch'}, _PROXY_ERROR)
+        seen.add(op_id)
+        plan.append((op_id, url, op.get('keyMode', request_data.get('keyMode', 'test')),
+                     op.get('cache', request_data.get('cache', True)), body, deps))
+
+    # Imported here: concurrent.futures pulls in logging and traceback,
+    # which every other proxy request would pay for on a cold start
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Operations are submitted in order, so every dependency is already
+    # running (or done) by the time a worker blocks waiting on it
+    futures = {}
+    deadline = Deadline()
+    with ThreadPoolExecutor(max_workers=min(len(plan), BATCH_WORKERS)) as executor:
+        for op_id, url, key_mode, use_cache, body, deps in plan:
+            futures[op_id] = executor.submit(
+                _batch_operation, timer, deadline, op_id, url, key_mode, use_cache, body,
+                {dep: futures[dep] for dep in deps})
+        results = [futures[op_id].result() for op_id, *_ in plan]
+    return json_response({'results': results})
+
+
+def _batch_operation(timer, deadline, op_id, url, key_mode, use_cache, body, deps):
+    with _metrics.attached(timer):
+        outputs = {}
+        for dep, future in deps.items():
+            result = future.result()
+            if result.get('error') or result['status'] >= 400 or (
+                    isinstance(result['body'], dict) and result['body'].get('errors')):
+                return {'id': op_id, 'error': True, 'message': f'Skipped: {dep!r} failed'}
+            outputs[dep] = result['body']
+        try:
+            payload = _resolve_refs(body, outputs)
+        except LookupError as e:
+            return {'id': op_id, 'error': True, 'message': f'Unresolved reference {e.args[0]}'}
+        try:
+            _check_query(payload)
+        except HTTPError as e:
+            return {'id': op_id, 'error': True, 'message': e.payload['message']}
+
+        req_body = (json.dumps(payload) if isinstance(payload, dict) else payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        _use_server_key(headers, key_mode)
+        cache_key, ttl, cached, _ = _cache_lookup(use_cache, url, 'POST', key_mode, payload)
+        start = time.perf_counter()
+        try:
+            (status_code, reason, _, response_body), _ = _fetch(
+                'POST', url, req_body, headers, cached, cache_key, ttl,
+                None if cached else coalesce_key(url, 'POST', key_mode, payload), deadline, key_mode)
+        except (OSError, http.client.HTTPException) as e:
+            return {'id': op_id, 'error': True, 'message': f'Connection failed: {str(e)}'}
+        try:
+            parsed = json.loads(response_body)
+        except ValueError:
+            parsed = response_body.decode('utf-8', errors='replace')
+        return {'id': op_id, 'status': status_code, 'statusText': reason, 'body': parsed,
+                'cached': bool(cached), 'ms': round((time.perf_counter() - start) * 1000, 1)}
+
+
+def _lookup(outputs, op_id, path):
+    value = outputs[op_id]
+    for key in path.split('.')[1:]:
+        if isinstance(value, list) and key.isdigit():
+            value = value[int(key)]
+        elif isinstance(value, dict):
+            value = value[key]
+        else:
+            raise KeyError(key)
+    return value
+
+
+def _resolve_refs(value, outputs):
+    """Substitute ``{{id.path}}`` placeholders in an operation body.
+
+    A string that is exactly one placeholder becomes the referenced value
+    itself (so IDs, numbers and objects keep their type in variables);
+    placeholders inside longer strings, such as the query text, are
+    replaced with the value's text.
+    """
+    if isinstance(value, dict):
+        return {k: _resolve_refs(v, outputs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_resolve_refs(v, outputs) for v in value]
+    if not isinstance(value, str) or '{{' not in value:
+        return value
+
+    def lookup(match):
+        try:
+            return _lookup(outputs, match.group(1), match.group(2))
+        except (KeyError, IndexError):
+            raise LookupError(match.group(0)) from None
+
+    whole = _REF_RE.fullmatch(value.strip())
+    if whole:
+        return lookup(whole)
+
+    def text(match):
+        found = lookup(match)
+        # Escaped like a JSON string so quotes in a value can't break the query
+        return json.dumps(found)[1:-1] if isinstance(found, str) else json.dumps(found)
+    return _REF_RE.sub(text, value)
+
+
+def _vision(request, content_type):
+    """Run itemsExtract on an uploaded image.
+
+    Accepts multipart/form-data (an ``image`` file plus ``url``, ``keyMode``,
+    ``query``, ``shipToCountry`` and ``localizedLanguageCode`` fields) or a
+    raw ``image/*`` body with the same fields in the query string. The
+    GraphQL body is assembled around the base64 image instead of decoding
+    and re-encoding a JSON document that contains it, and the response is
+    relayed as in ``stream`` mode.
+    """
+    if int(request.headers.get('Content-Length', 0) or 0) > VISION_MAX_BYTES:
+        raise HTTPError(413, {'error': True, 'message': 'Image too large'}, _PROXY_ERROR)
+
+    if content_type.startswith('multipart/form-data'):
+        try:
+            form = request.form()
+        except ValueError as e:
+            raise HTTPError(400, {'error': True, 'message': str(e)}, _PROXY_ERROR)
+        image = form.pop('image', None)
+        image = image.data if image is not None else b''
+        fields = {name: part.data.decode('utf-8') for name, part in form.items() if part.filename is None}
+    else:
+        image = request.body
+        fields = {name: values[0] for name, values in request.query.items()}
+
+    if not image:
+        raise HTTPError(400, {'error': True, 'message': 'Missing image'}, _PROXY_ERROR)
+
+    target_url = fields.get('url')
+    _check_target(target_url)
+    query = fields.get('query') or _VISION_QUERY
+    key_mode = fields.get('keyMode', 'test')
+    _check_query({'query': query})
+
+    timer = _metrics.current()
+    if timer is not None:
+        timer.set_operation(_operation({'query': query}))
+
+    variables = {'input': {
+        'localizedLanguageCode': fields.get('localizedLanguageCode', 'EN'),
+        'shipToCountry': fields.get('shipToCountry', 'US'),
+        'configuration': {'classify': 'ENABLED', 'estimateValue': 'ENABLED'},
+        'imageBase64': _IMAGE_SLOT,
+    }}
+    # The image slot is the last string in the document, after the query
+    before, after = json.dumps({'query': query, 'variables': variables}).encode('utf-8').rsplit(
+        json.dumps(_IMAGE_SLOT).encode(), 1)
+    encoded = binascii.b2a_base64(image, newline=False)
+    body = (before + b'"', encoded, b'"' + after)
+
+    headers = {'Content-Type': 'application/json', 'Content-Length': str(sum(map(len, body)))}
+    _use_server_key(headers, key_mode)
+
+    # Key the cache (and fixtures) on a digest of the image rather than the
+    # image itself
+    variables['input']['imageBase64'] = hashlib.sha256(image).hexdigest()
+    keyed = {'query': query, 'variables': variables}
+    cache_key, ttl, cached, extra = _cache_lookup(
+        fields.get('cache', 'true') != 'false', target_url, 'POST', key_mode, keyed)
+
+    if get_fixtures() is None:
+        return _proxy_stream('POST', target_url, body, headers, cached, cache_key, ttl, extra)
+    # Fixtures hold whole responses, as in post()
+    try:
+        (status_code, _, upstream_headers, response_body), _ = _fetch(
+            'POST', target_url, body, headers, cached, cache_key, ttl,
+            key_mode=key_mode, fixture_body=json.dumps(keyed).encode('utf-8'))
+    except (OSError, http.client.HTTPException) as e:
+        return _upstream_error(e, stream=True)
+    return Response(response_body, status_code, _passthrough_headers(upstream_headers, extra))
+
+
+def _passthrough_headers(upstream_headers, extra):
+    headers = [(k, v) for k, v in relay_headers(upstream_headers) if k.lower() not in _STRIP_HEADERS]
+    return headers + list(extra.items())
+
+
+def _proxy_stream(method, target_url, req_body, headers, cached, cache_key, ttl, extra, idempotent=False):
+    """Relay the upstream status, headers and body bytes as they arrive.
+
+    Errors raised by the proxy itself (rather than by Zonos) are marked
+    with an X-Proxy-Error header so the client can tell them apart. Only
+    ``idempotent`` requests (queries) are retried.
+    """
+    if cached:
+        status_code, _, upstream_headers, response_body = cached
+        return Response(response_body, status_code, _passthrough_headers(upstream_headers, extra))
+
+    try:
+        upstream = call_upstream(
+            lambda timeout: open_stream(method, target_url, body=req_body, headers=headers, timeout=timeout),
+            Deadline(), idempotent=idempotent)
+    except (OSError, http.client.HTTPException) as e:
+        return _upstream_error(e, stream=True)
+
+    cache = get_cache() if cache_key else None
+    return Response(
+        _Relay(upstream, cache, cache_key, ttl),
+        upstream.status, _passthrough_headers(upstream.headers, extra),
+    )
+
+
+class _Relay:
+    """The upstream body as a response body, teed into the cache if it fits."""
+
+    def __init__(self, upstream, cache, cache_key, ttl):
+        self.upstream = upstream
+        self.cache = cache
+        self.cache_key = cache_key
+        self.ttl = ttl
+
+    def __iter__(self):
+        upstream = self.upstream
+        captured = [] if self.cache else None
+        size = 0
         try:
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length)
-            request_data = json.loads(body)
-
-            target_url = request_data.get('url')
-            method = request_data.get('method', 'GET')
-            headers = request_data.get('headers', {})
-            payload = request_data.get('body')
-
-            if not target_url:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self._cors_headers()
-                self.end_headers()
-                self.wfile.write(json.dumps({'error': True, 'message': 'Missing URL'}).encode())
-                return
-
-            # Only allow proxying to Zonos API endpoints
-            try:
-                _parsed = _urlparse(target_url)
-                if _parsed.scheme != 'https' or _parsed.netloc != _ALLOWED_HOST:
-                    self.send_response(400)
-                    self.send_header('Content-Type', 'application/json')
-                    self._cors_headers()
-                    self.end_headers()
-                    self.wfile.write(json.dumps({'error': True, 'message': 'Disallowed target URL'}).encode())
-                    return
-            except Exception:
-                pass
-
-            req_body = None
-            if payload:
-                if isinstance(payload, dict):
-                    req_body = json.dumps(payload).encode('utf-8')
-                else:
-                    req_body = payload.encode('utf-8')
-
-            # Use server-side API key based on keyMode (never trust client-supplied credentialToken)
-            key_mode = request_data.get('keyMode', 'test')
-            headers.pop('credentialToken', None)  # always strip any client-supplied key
-            if key_mode == 'live':
-                server_key = os.environ.get('ZONOS_LIVE_API_KEY', '')
-            else:
-                server_key = os.environ.get('ZONOS_API_KEY', '')
-            if server_key:
-                headers['credentialToken'] = server_key
-
-            req = urllib.request.Request(target_url, data=req_body, method=method)
-            for key, value in headers.items():
-                req.add_header(key, value)
-
-            ctx = ssl.create_default_context()
-
-            try:
-                with urllib.request.urlopen(req, context=ctx, timeout=30) as response:
-                    response_body = response.read().decode('utf-8')
-                    status_code = response.status
-
-                    # Strip sensitive headers before returning to client
-                    safe_headers = {
-                        k: v for k, v in dict(response.headers).items()
-                        if k.lower() not in _STRIP_HEADERS
-                    }
-
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self._cors_headers()
-                    self.end_headers()
-
-                    result = {
-                        'status': status_code,
-                        'statusText': response.reason,
-                        'headers': safe_headers,
-                        'body': response_body
-                    }
-                    self.wfile.write(json.dumps(result).encode())
-
-            except urllib.error.HTTPError as e:
-                response_body = e.read().decode('utf-8')
-                safe_headers = {
-                    k: v for k, v in dict(e.headers).items()
-                    if k.lower() not in _STRIP_HEADERS
-                }
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self._cors_headers()
-                self.end_headers()
-
-                result = {
-                    'status': e.code,
-                    'statusText': e.reason,
-                    'headers': safe_headers,
-                    'body': response_body
-                }
-                self.wfile.write(json.dumps(result).encode())
-
-        except urllib.error.URLError as e:
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self._cors_headers()
-            self.end_headers()
-            result = {'error': True, 'message': f'Connection failed: {str(e.reason)}'}
-            self.wfile.write(json.dumps(result).encode())
-
-        except Exception as e:
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self._cors_headers()
-            self.end_headers()
-            result = {'error': True, 'message': 'Internal error'}
-            self.wfile.write(json.dumps(result).encode())
+            for chunk in upstream:
+                yield chunk
+                if captured is not None:
+                    size += len(chunk)
+                    if size > self.cache.max_bytes:
+                        captured = None
+                    else:
+                        captured.append(chunk)
+        except (OSError, http.client.HTTPException):
+            # Headers are already out; the client sees a truncated body
+            return
+        finally:
+            upstream.close()
+        if captured is not None:
+            body = b''.join(captured)
+            if is_cacheable_response(upstream.status, body):
+                self.cache.set(self.cache_key, (upstream.status, upstream.reason, upstream.headers, body),
+                               len(body), self.ttl)
+
+    def close(self):
+        self.upstream.close()
+
+
+endpoint = Endpoint(
+    {'GET': get, 'POST': post},
+    allow_headers='Content-Type, Authorization',
+    expose_headers=f'{CACHE_HEADER}, {COALESCED_HEADER}, X-Proxy-Error, Retry-After',
+    internal_error=({'error': True, 'message': 'Internal error'}, 200, _PROXY_ERROR),
+)
+handler = endpoint.handler_class()
@@ -1,108 +1,94 @@
-import json
-import os
-import re
-import urllib.request
-import urllib.error
-import ssl
-from http.server import BaseHTTPRequestHandler
-from urllib.parse import parse_qs, urlparse
-
-_UUID_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
-
-
-ALLOWED_ORIGIN = 'https://zonos-api-demo.vercel.app'
-
-
-class handler(BaseHTTPRequestHandler):
-    def _cors_headers(self):
-        self.send_header('Access-Control-Allow-Origin', ALLOWED_ORIGIN)
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self._cors_headers()
-        self.end_headers()
-
-    def do_POST(self):
-        """Receive webhook events from Zonos and store in Supabase."""
-        supabase_url = os.environ.get('SUPABASE_URL', '')
-        supabase_key = os.environ.get('SUPABASE_SERVICE_KEY', '')
-
-        # Parse session ID from query string
-        parsed = urlparse(self.path)
-        params = parse_qs(parsed.query)
-        session_id = params.get('session', [None])[0]
-
-        if not session_id or not _UUID_RE.match(session_id):
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self._cors_headers()
-            self.end_headers()
-            self.wfile.write(json.dumps({'ok': False, 'error': 'Invalid session ID'}).encode())
-            return
-
-        # Read the POST body
-        content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length) if content_length > 0 else b'{}'
-
-        try:
-            payload = json.loads(body)
-        except json.JSONDecodeError:
-            payload = {'raw': body.decode('utf-8', errors='replace')}
-
-        # Extract event type from common webhook formats
-        event_type = (
-            payload.get('event')
-            or payload.get('type')
-            or payload.get('event_type')
-            or 'unknown'
-        )
-
-        # Capture useful headers
-        headers_dict = {}
-        for key in ['content-type', 'user-agent', 'x-zonos-signature',
-                     'x-webhook-id', 'x-forwarded-for']:
-            val = self.headers.get(key)
-            if val:
-                headers_dict[key] = val
-
-        # Get source IP
-        source_ip = (
-            self.headers.get('x-forwarded-for', '').split(',')[0].strip()
-            or self.headers.get('x-real-ip', '')
-            or ''
-        )
-
-        # Insert into Supabase
-        if supabase_url and supabase_key:
-            row = {
-                'session_id': session_id,
-                'event_type': event_type,
-                'payload': payload,
-                'headers': headers_dict,
-                'source_ip': source_ip,
-            }
-
-            req = urllib.request.Request(
-                f'{supabase_url}/rest/v1/webhook_events',
-                data=json.dumps(row).encode('utf-8'),
-                method='POST',
-            )
-            req.add_header('apikey', supabase_key)
-            req.add_header('Authorization', f'Bearer {supabase_key}')
-            req.add_header('Content-Type', 'application/json')
-            req.add_header('Prefer', 'return=minimal')
-
-            ctx = ssl.create_default_context()
-            try:
-                urllib.request.urlopen(req, context=ctx, timeout=5)
-            except Exception:
-                pass  # Always return 200 to prevent Zonos retries
-
-        # Always return 200
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self._cors_headers()
-        self.end_headers()
-        self.wfile.write(json.dumps({'ok': True, 'session': session_id}).encode())
+import json
+
+from api import _metrics
+from api._core import Endpoint, json_response
+from api._events import broker, now_cursor, valid_session
+from api._ingest import get_queue, seen
+from api._store import get_store
+
+# Longest x-webhook-id kept for duplicate suppression
+MAX_WEBHOOK_ID = 200
+
+
+def _duplicate(session_id):
+    _metrics.registry.inc('webhook_duplicates_total')
+    return json_response({'ok': True, 'session': session_id, 'duplicate': True})
+
+
+def post(request):
+    """Receive webhook events from Zonos and hand them to the event store.
+
+    A redelivery (same x-webhook-id for the session) is acked with
+    ``"duplicate": true`` and goes no further.
+    """
+    session_id = request.arg('session')
+
+    if not valid_session(session_id):
+        return json_response({'ok': False, 'error': 'Invalid session ID'})
+
+    webhook_id = request.headers.get('x-webhook-id', '').strip()[:MAX_WEBHOOK_ID] or None
+    seen_key = (session_id, webhook_id)
+    if webhook_id and not seen.add(seen_key):
+        return _duplicate(session_id)
+
+    body = request.body or b'{}'
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError:
+        payload = {'raw': body.decode('utf-8', errors='replace')}
+
+    # Extract event type from common webhook formats
+    event_type = (
+        payload.get('event')
+        or payload.get('type')
+        or payload.get('event_type')
+        or 'unknown'
+    )
+
+    # Capture useful headers
+    headers_dict = {}
+    for key in ['content-type', 'user-agent', 'x-zonos-signature',
+                'x-webhook-id', 'x-forwarded-for']:
+        val = request.headers.get(key)
+        if val:
+            headers_dict[key] = val
+
+    row = {
+        'session_id': session_id,
+        'event_type': event_type,
+        'payload': payload,
+        'headers': headers_dict,
+        'source_ip': request.client_ip,
+        # Stamped here; also the cursor while no store has given the row an id
+        'received_at': now_cursor(),
+        'webhook_id': webhook_id,
+    }
+
+    # An embedded store is written right away, and its unique key catches
+    # redeliveries the seen-set no longer remembers; a remote one is written
+    # through the write-behind queue. Open streams in this process get the
+    # event either way, with the store's id when it already has one, so it
+    # matches the row later read back.
+    store = get_store()
+    if store is not None and store.local:
+        try:
+            inserted = store.write([row])
+        except Exception:
+            seen.discard(seen_key)
+            raise
+        if webhook_id and not inserted:
+            return _duplicate(session_id)
+    broker.publish(session_id, row)
+    queue = get_queue()
+    if queue is not None:
+        queue.put(row)
+
+    # Always return 200 (before touching storage) to prevent Zonos retries
+    response = json_response({'ok': True, 'session': session_id, 'duplicate': False})
+    if queue is not None:
+        response.after.append(queue.after_response)
+    return response
+
+
+endpoint = Endpoint({'POST': post}, internal_error=({'ok': False, 'error': 'Internal error'}, 200, None))
+handler = endpoint.handler_class()
@@ -0,0 +1,53 @@
+import hashlib
+import json
+
+from api._core import Endpoint, Response, json_response
+from api._events import (HISTORY, broker, cursor_of, is_newer, latest_cursor, parse_cursor, recent_events,
+                         valid_session, with_id)
+
+
+def get(request):
+    """Return a session's webhook events after the cursor ``since``.
+
+    ``fields=summary`` drops payloads and headers. The ETag is derived
+    from the newest event, so an unchanged session is answered with 304
+    after a single one-row lookup. ``stream`` tells the page whether
+    /webhook-events/stream can push events instead.
+    """
+    session_id = request.arg('session')
+    since = request.arg('since')
+    cursor = parse_cursor(since)
+    summary = request.arg('fields') == 'summary'
+
+    if not valid_session(session_id):
+        return json_response({'ok': False, 'error': 'Invalid session ID'}, 400)
+
+    try:
+        limit = max(1, min(HISTORY, int(request.arg('limit', HISTORY))))
+        latest = latest_cursor(session_id)
+        tag = hashlib.sha256(
+            json.dumps([session_id, since, summary, limit, latest]).encode()
+        ).hexdigest()[:32]
+        etag = f'W/"{tag}"'
+
+        if etag in [t.strip() for t in request.headers.get('If-None-Match', '').split(',')]:
+            return Response(status=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+        if latest is None or not is_newer(latest, cursor):
+            events = []
+        else:
+            events = recent_events(session_id, cursor, summary=summary, limit=limit)
+    except (OSError, ValueError):
+        return json_response({'ok': False, 'error': 'Failed to read events'}, 502)
+
+    events = [with_id(e) for e in events]
+    return json_response({
+        'ok': True,
+        'cursor': cursor_of(events[-1]) if events else since,
+        'events': events,
+        'stream': broker.can_stream(),
+    }, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+
+endpoint = Endpoint({'GET': get}, allow_headers='Content-Type, If-None-Match', expose_headers='ETag')
+handler = endpoint.handler_class()
@@ -0,0 +1,74 @@
+import time
+
+from api._core import Endpoint, event_stream, json_response, sse_frame
+from api._events import broker, cursor_of, parse_cursor, recent_events, valid_session, wait_for_events, with_id
+
+# A stream ends after this long and the browser reconnects with Last-Event-ID,
+# which keeps each invocation inside the serverless duration limit
+STREAM_SECONDS = 25
+KEEPALIVE_SECONDS = 10
+MAX_LONG_POLL = 25
+
+
+def get(request):
+    """Push new webhook events for a session.
+
+    Server-sent events by default; ``?wait=N`` switches to a long-poll
+    that returns JSON as soon as anything newer than ``since`` arrives.
+    Streams are only served where ingestion runs in the same process
+    (server.py, threaded mode) and only up to ``broker.max_streams`` at
+    once: elsewhere every open tab would hold a function or worker busy,
+    so clients are told to poll /webhook-events instead.
+    """
+    session_id = request.arg('session')
+    since = parse_cursor(request.headers.get('Last-Event-ID') or request.arg('since'))
+
+    if not valid_session(session_id):
+        return json_response({'ok': False, 'error': 'Invalid session ID'}, 400)
+
+    if request.arg('wait') is not None:
+        return _long_poll(session_id, since, request.arg('wait'))
+    if not broker.open_stream():
+        return json_response({'ok': False, 'error': 'Streaming is not available here; poll /webhook-events'}, 404)
+    response = event_stream(_stream(session_id, since))
+    response.after.append(broker.close_stream)
+    return response
+
+
+def _long_poll(session_id, since, wait):
+    try:
+        timeout = min(MAX_LONG_POLL, max(0.0, float(wait)))
+        events = recent_events(session_id, since) if since is None else []
+        if not events:
+            events = wait_for_events(session_id, since, timeout)
+    except (OSError, ValueError):
+        return json_response({'ok': False, 'error': 'Failed to read events'}, 502)
+
+    return json_response({
+        'ok': True,
+        'cursor': cursor_of(events[-1]) if events else since,
+        'events': [with_id(e) for e in events],
+    }, headers={'Cache-Control': 'no-store'})
+
+
+def _stream(session_id, since):
+    deadline = time.monotonic() + STREAM_SECONDS
+    yield b'retry: 1000\n\n'
+    try:
+        events = recent_events(session_id, since)
+        while True:
+            for row in events:
+                since = cursor_of(row)
+                yield sse_frame('webhook', with_id(row), event_id=since)
+            if not events:
+                yield b': keepalive\n\n'
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            events = wait_for_events(session_id, since, min(KEEPALIVE_SECONDS, remaining))
+    except (OSError, ValueError):
+        yield sse_frame('error', {'error': 'Failed to read events'})
+
+
+endpoint = Endpoint({'GET': get}, allow_headers='Content-Type, Last-Event-ID')
+handler = endpoint.handler_class()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Cold-start import cost of each serverless function in api/
+
+Every endpoint is imported in fresh interpreters with -X importtime, after
+the modules the Python runtime loads anyway (http.server, json), so the
+numbers only cover what the endpoint itself pulls in.
+
+Usage:
+  python bench/importtime.py                 table, median of 5 runs
+  python bench/importtime.py --runs 9 --top 8
+  python bench/importtime.py --json          machine-readable output
+  python bench/importtime.py --budget-ms 50  exit 1 if any endpoint is slower
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Already imported by the runtime before any handler module is loaded
+PRELOAD = 'import http.server, json'
+
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def endpoints():
+    api_dir = os.path.join(ROOT, 'api')
+    return sorted(
+        f'api.{name[:-3]}' for name in os.listdir(api_dir)
+        if name.endswith('.py') and not name.startswith('_')
+    )
+
+
+def measure(module):
+    """Return ``(cumulative_us, {submodule: self_us})`` for one fresh import."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'{PRELOAD}\nimport {module}'],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'{module} failed to import:\n{result.stderr.strip().splitlines()[-1]}')
+
+    # Lines are printed children-first, each import's own line after them, so
+    # the block just before the endpoint's top-level line is its subtree
+    lines = [m for m in map(_LINE_RE.match, result.stderr.splitlines()) if m]
+    end = next(i for i, m in enumerate(lines) if m.group(4) == module and len(m.group(3)) == 1)
+    start = end
+    while start > 0 and len(lines[start - 1].group(3)) > 1:
+        start -= 1
+    own = {m.group(4): int(m.group(1)) for m in lines[start:end + 1]}
+    return int(lines[end].group(2)), own
+
+
+def report(module, runs):
+    totals, breakdown = [], {}
+    for _ in range(runs):
+        total, own = measure(module)
+        totals.append(total)
+        for name, us in own.items():
+            breakdown.setdefault(name, []).append(us)
+    return {
+        'endpoint': module,
+        'median_ms': round(statistics.median(totals) / 1000, 2),
+        'min_ms': round(min(totals) / 1000, 2),
+        'max_ms': round(max(totals) / 1000, 2),
+        'modules': sorted(
+            ({'module': name, 'self_ms': round(statistics.median(us) / 1000, 2)} for name, us in breakdown.items()),
+            key=lambda m: -m['self_ms'],
+        ),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import-time benchmark for api/ endpoints')
+    parser.add_argument('endpoints', nargs='*', help='module names, e.g. api.chat (default: all)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help='slowest modules to list per endpoint')
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--budget-ms', type=float, help='fail if any endpoint median exceeds this')
+    args = parser.parse_args(argv)
+
+    results = [report(module, args.runs) for module in args.endpoints or endpoints()]
+
+    if args.json:
+        for r in results:
+            r['modules'] = r['modules'][:args.top]
+        print(json.dumps({'python': sys.version.split()[0], 'runs': args.runs, 'results': results}, indent=2))
+    else:
+        print(f"{'endpoint':<22}{'median ms':>10}{'min':>8}{'max':>8}   slowest modules (self ms)")
+        for r in results:
+            slowest = ', '.join(f"{m['module']} {m['self_ms']}" for m in r['modules'][:args.top])
+            print(f"{r['endpoint']:<22}{r['median_ms']:>10}{r['min_ms']:>8}{r['max_ms']:>8}   {slowest}")
+
+    if args.budget_ms is not None:
+        over = [r['endpoint'] for r in results if r['median_ms'] > args.budget_ms]
+        if over:
+            print(f"\nOver the {args.budget_ms} ms budget: {', '.join(over)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Load test server.py against local stand-ins for Zonos, Supabase and Anthropic
+
+Starts the mocks from bench/mocks.py, runs server.py in a subprocess pointed
+at them, drives each scenario with concurrent clients and prints one JSON
+document with requests/sec, latency percentiles, errors and the server's
+peak RSS. Compare two runs (before/after a change) with --compare.
+
+Scenarios:
+  proxy         POST /proxy, JSON envelope
+  proxy-stream  POST /proxy with stream: true
+  webhook       POST /webhook/<session> (rows are flushed to the Supabase mock)
+  chat          POST /chat with stream: true, answer cache off (needs the
+                anthropic package)
+  chat-cached   the same question with the answer cache on, so all but the
+                first request are cache hits (not run by default)
+
+Usage:
+  python bench/loadtest.py
+  python bench/loadtest.py --scenarios proxy,webhook --concurrency 32 --duration 10
+  python bench/loadtest.py --zonos-latency-ms 150 --zonos-payload-kb 64 -o after.json
+  python bench/loadtest.py --server-args "--cache" -o cached.json
+  python bench/loadtest.py --zonos-error-rate 0.2     a flaky upstream
+  python bench/loadtest.py --compare before.json after.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import resource
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from mocks import AnthropicMock, SupabaseMock, ZonosMock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ('proxy', 'proxy-stream', 'webhook', 'chat', 'chat-cached')
+
+_QUERY = 'mutation { classificationsCalculate(input: [{ name: "cotton t-shirt" }]) { id } }'
+
+
+def _requests():
+    """Build ``(method, path, body)`` for each scenario."""
+    session = str(uuid.uuid4())
+    proxy = {
+        'url': 'https://api.zonos.com/graphql', 'method': 'POST', 'keyMode': 'test',
+        'headers': {'Content-Type': 'application/json'}, 'body': {'query': _QUERY},
+    }
+    chat = {'messages': [{'role': 'user', 'content': 'What is landed cost?'}], 'session': session, 'stream': True}
+    return {
+        'proxy': ('POST', '/proxy', proxy),
+        'proxy-stream': ('POST', '/proxy', dict(proxy, stream=True)),
+        'webhook': ('POST', f'/webhook/{session}', {'event': 'ORDER_CREATED', 'data': {'order': {'id': 'o_1'}}}),
+        # Every request asks the same question, so the model is only called
+        # when the answer cache is skipped
+        'chat': ('POST', '/chat', dict(chat, cache=False)),
+        'chat-cached': ('POST', '/chat', chat),
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _peak_rss_kb(pid):
+    """VmHWM of a running process (Linux), else None."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def start_server(port, env, server_args):
+    cmd = [sys.executable, os.path.join(ROOT, 'server.py'), '--port', str(port)] + server_args
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'server.py exited:\n{proc.stderr.read().decode()}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError('server.py did not start listening')
+
+
+def one_request(port, method, path, body, timeout):
+    """Send one request and read the whole response; returns (status, bytes)."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        data = json.dumps(body).encode()
+        conn.request(method, path, body=data, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        payload = response.read()
+        if response.getheader('X-Proxy-Error'):
+            return 599, len(payload)
+        return response.status, len(payload)
+    finally:
+        conn.close()
+
+
+def run_scenario(port, request, concurrency, duration, max_requests, warmup, timeout):
+    method, path, body = request
+    for _ in range(warmup):
+        try:
+            one_request(port, method, path, body, timeout)
+        except OSError:
+            pass
+
+    latencies, errors, statuses = [], [], {}
+    received = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+    remaining = [max_requests] if max_requests else None
+
+    def worker():
+        while time.monotonic() < stop_at:
+            if remaining is not None:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                status, size = one_request(port, method, path, body, timeout)
+            except (OSError, http.client.HTTPException) as e:
+                with lock:
+                    errors.append(type(e).__name__)
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if 200 <= status < 300:
+                    latencies.append(elapsed)
+                    received[0] += size
+                else:
+                    errors.append(f'HTTP {status}')
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        'requests': len(latencies) + len(errors),
+        'ok': len(latencies),
+        'errors': len(errors),
+        'error_kinds': sorted(set(errors)),
+        'statuses': {str(k): v for k, v in sorted(statuses.items())},
+        'seconds': round(wall, 3),
+        'rps': round(len(latencies) / wall, 1) if wall else None,
+        'bytes_received': received[0],
+        'latency_ms': {
+            'mean': ms(sum(ordered) / len(ordered)) if ordered else None,
+            'p50': ms(_percentile(ordered, 0.50)),
+            'p90': ms(_percentile(ordered, 0.90)),
+            'p95': ms(_percentile(ordered, 0.95)),
+            'p99': ms(_percentile(ordered, 0.99)),
+            'max': ms(ordered[-1]) if ordered else None,
+        },
+    }
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    rows = {}
+    for name, result in after['scenarios'].items():
+        old = before['scenarios'].get(name)
+        if not old:
+            continue
+
+        def change(a, b):
+            return round((b - a) / a * 100, 1) if a and b is not None else None
+
+        rows[name] = {
+            'rps': [old['rps'], result['rps'], change(old['rps'], result['rps'])],
+            **{f'{q}_ms': [old['latency_ms'][q], result['latency_ms'][q],
+                           change(old['latency_ms'][q], result['latency_ms'][q])]
+               for q in ('p50', 'p95', 'p99')},
+        }
+    rss = [before.get('server_peak_rss_kb'), after.get('server_peak_rss_kb')]
+    print(json.dumps({'columns': ['before', 'after', 'change_pct'], 'scenarios': rows,
+                      'server_peak_rss_kb': rss + [change(*rss) if all(rss) else None]}, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test server.py against local mocks')
+    parser.add_argument('--scenarios', default='proxy,proxy-stream,webhook,chat')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--requests', type=int, default=0, help='stop a scenario after this many requests')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--zonos-latency-ms', type=float, default=50)
+    parser.add_argument('--zonos-payload-kb', type=int, default=4)
+    parser.add_argument('--zonos-error-rate', type=float, default=0.0, help='share of Zonos calls that fail with 503')
+    parser.add_argument('--supabase-latency-ms', type=float, default=20)
+    parser.add_argument('--anthropic-latency-ms', type=float, default=200, help='delay before the first token')
+    parser.add_argument('--anthropic-tokens', type=int, default=50)
+    parser.add_argument('--anthropic-token-interval-ms', type=float, default=5)
+    parser.add_argument('--server-args', default='', help='extra arguments for server.py, e.g. "--cache"')
+    parser.add_argument('-o', '--output', help='also write the JSON report to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='diff two reports and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    names = [n.strip() for n in args.scenarios.split(',') if n.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenario(s): {", ".join(sorted(unknown))}')
+
+    zonos = ZonosMock(args.zonos_latency_ms, args.zonos_payload_kb, args.zonos_error_rate).start()
+    supabase = SupabaseMock(args.supabase_latency_ms).start()
+    anthropic = AnthropicMock(args.anthropic_latency_ms, args.anthropic_tokens,
+                              args.anthropic_token_interval_ms).start()
+
+    env = dict(
+        os.environ,
+        ZONOS_UPSTREAM=zonos.url,
+        ZONOS_API_KEY='bench-key',
+        SUPABASE_URL=supabase.url,
+        SUPABASE_SERVICE_KEY='bench-key',
+        ANTHROPIC_API_KEY='bench-key',
+        ANTHROPIC_BASE_URL=anthropic.url,
+        DEMO_ACCESS_CODE='',  # no session tokens needed
+        PYTHONUNBUFFERED='1',
+    )
+    port = _free_port()
+    server = start_server(port, env, shlex.split(args.server_args))
+    requests = _requests()
+    results = {}
+    try:
+        for name in names:
+            results[name] = run_scenario(port, requests[name], args.concurrency, args.duration,
+                                         args.requests, args.warmup, args.timeout)
+        peak_rss = _peak_rss_kb(server.pid)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+        for mock in (zonos, supabase, anthropic):
+            mock.stop()
+    if peak_rss is None:
+        # ru_maxrss is in KB on Linux and bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        if sys.platform == 'darwin':
+            peak_rss //= 1024
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'server_peak_rss_kb': peak_rss,
+        'upstream_requests': {'zonos': zonos.requests, 'supabase': supabase.requests,
+                              'anthropic': anthropic.requests, 'supabase_rows': supabase.inserted},
+        'scenarios': results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    return 1 if any(r['ok'] == 0 for r in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
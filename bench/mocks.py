@@ -0,0 +1,184 @@
+"""
+Local stand-ins for the services the API Explorer talks to
+
+  ZonosMock      POST /graphql, answers any operation with a padded payload
+                 (or a 503, for a share of requests)
+  SupabaseMock   PostgREST subset used for webhook_events (insert/select/delete)
+  AnthropicMock  POST /v1/messages, plain and streaming (SSE)
+
+Each runs on its own port in a background thread, with a configurable
+response delay and payload size.
+"""
+
+import http.server
+import json
+import random
+import threading
+import time
+import uuid
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; don't let Nagle's algorithm
+    # add delayed-ACK stalls that a real upstream would not have
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0) or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status, body=b'', content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockServer:
+    """Base for the mocks: a threaded server bound to a free local port."""
+
+    handler = _Handler
+
+    def __init__(self, latency_ms=0, payload_kb=1):
+        self.latency = latency_ms / 1000
+        self.payload_kb = payload_kb
+        self.requests = 0
+        self._lock = threading.Lock()
+        mock = self
+
+        class Handler(self.handler):
+            server_mock = mock
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.httpd.server_port}'
+
+    def hit(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _padding(kb):
+    return 'x' * max(0, kb * 1024 - 200)
+
+
+class _ZonosHandler(_Handler):
+    def do_POST(self):
+        mock = self.server_mock
+        body = self._read_body()
+        mock.hit()
+        try:
+            query = json.loads(body).get('query', '')
+        except ValueError:
+            self._send(400, json.dumps({'errors': [{'message': 'Invalid JSON'}]}).encode())
+            return
+        if random.random() < mock.error_rate:
+            self._send(503, json.dumps({'errors': [{'message': 'Service unavailable'}]}).encode())
+            return
+        field = query.split('{', 2)[1].split('(')[0].strip() if query.count('{') >= 2 else 'result'
+        result = {'data': {field: {'id': f'mock_{uuid.uuid4().hex[:12]}', 'padding': _padding(mock.payload_kb)}}}
+        self._send(200, json.dumps(result).encode())
+
+
+class ZonosMock(MockServer):
+    """``error_rate`` of the requests fail with a 503, like a degraded upstream."""
+
+    handler = _ZonosHandler
+
+    def __init__(self, latency_ms=0, payload_kb=1, error_rate=0.0):
+        super().__init__(latency_ms, payload_kb)
+        self.error_rate = error_rate
+
+
+class _SupabaseHandler(_Handler):
+    def do_POST(self):
+        rows = json.loads(self._read_body() or b'[]')
+        self.server_mock.hit()
+        with self.server_mock._lock:
+            self.server_mock.inserted += len(rows) if isinstance(rows, list) else 1
+        self._send(201)
+
+    def do_GET(self):
+        self.server_mock.hit()
+        self._send(200, b'[]')
+
+    def do_DELETE(self):
+        self.server_mock.hit()
+        self._send(204)
+
+
+class SupabaseMock(MockServer):
+    handler = _SupabaseHandler
+
+    def __init__(self, latency_ms=0, payload_kb=1):
+        super().__init__(latency_ms, payload_kb)
+        self.inserted = 0
+
+
+class _AnthropicHandler(_Handler):
+    def do_POST(self):
+        mock = self.server_mock
+        request = json.loads(self._read_body() or b'{}')
+        mock.hit()
+        words = ['word '] * mock.tokens
+        message = {
+            'id': f'msg_{uuid.uuid4().hex[:24]}', 'type': 'message', 'role': 'assistant',
+            'model': request.get('model', 'mock'), 'stop_reason': None, 'stop_sequence': None,
+            'usage': {'input_tokens': 10, 'output_tokens': 0},
+        }
+        if not request.get('stream'):
+            message.update(content=[{'type': 'text', 'text': ''.join(words)}], stop_reason='end_turn')
+            message['usage']['output_tokens'] = len(words)
+            self._send(200, json.dumps(message).encode())
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def event(name, data):
+            self.wfile.write(f'event: {name}\ndata: {json.dumps(dict(data, type=name))}\n\n'.encode())
+            self.wfile.flush()
+
+        event('message_start', {'message': dict(message, content=[])})
+        event('content_block_start', {'index': 0, 'content_block': {'type': 'text', 'text': ''}})
+        for word in words:
+            if mock.token_interval:
+                time.sleep(mock.token_interval)
+            event('content_block_delta', {'index': 0, 'delta': {'type': 'text_delta', 'text': word}})
+        event('content_block_stop', {'index': 0})
+        event('message_delta', {'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                'usage': {'output_tokens': len(words)}})
+        event('message_stop', {})
+
+
+class AnthropicMock(MockServer):
+    """``latency_ms`` delays the first token; ``tokens`` deltas follow,
+    ``token_interval_ms`` apart."""
+
+    handler = _AnthropicHandler
+
+    def __init__(self, latency_ms=0, tokens=50, token_interval_ms=0):
+        super().__init__(latency_ms)
+        self.tokens = tokens
+        self.token_interval = token_interval_ms / 1000
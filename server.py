@@ -2,126 +2,131 @@
 """
 Simple API Explorer Server
 Run this, then open http://localhost:8000 in your browser
+
+Options:
+  --port N           port to listen on (default 8000)
+  --mode MODE        "threaded" (default) serves requests from a bounded worker
+                     pool; "single" handles one request at a time
+  --workers N        worker threads in threaded mode (default 32)
+  --max-upstream N   cap on concurrent upstream proxy calls (default 16)
+  --cache            cache read-only Zonos responses in memory
+  --cache-max-mb N   memory budget for the response cache (default 32)
+  --coalesce-window-ms N
+                     identical read-only queries within N ms of each other
+                     share one upstream call (default 100; -1 disables)
+  --max-streams N    live webhook event streams served at once, each holding a
+                     worker (default workers / 4; none in single mode, where
+                     the page polls instead)
+  --events-db PATH   keep webhook events in this SQLite database; used by
+                     default (~/.cache/zonos-api-explorer/webhook_events.db)
+                     when Supabase is not set up
+  --record PATH      append every Zonos response to this JSONL fixture file
+  --replay PATH      answer proxy requests from a recorded fixture file
+                     instead of Zonos (works offline; bench/loadtest.py can
+                     use it through --server-args)
+  --replay-latency-ms N
+                     delay each replayed response by N ms (default 0)
+
+index.html and the images are served from memory, gzip/brotli-compressed,
+with ETags; images get fingerprinted names the page is rewritten to use.
+
+Per-endpoint latency percentiles are served at /metrics (Prometheus format).
+Each proxy request gets PROXY_DEADLINE_SECONDS (default 25) upstream, retries
+included.
 """
 
+import argparse
 import http.server
 import json
-import urllib.request
-import urllib.error
-import ssl
-from urllib.parse import urlparse, parse_qs
+import os
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from api import _cache, _fixtures, _singleflight, _store
+from api._core import App
+from api._events import broker
+from api._ingest import get_queue
+from api._static import StaticSite
+from api._upstream import ALLOWED_HOST, get_pool
 
 PORT = 8000
+WORKERS = 32
+MAX_UPSTREAM = 16
 
-class APIProxyHandler(http.server.SimpleHTTPRequestHandler):
-    def do_OPTIONS(self):
-        """Handle preflight requests"""
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, PATCH, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', '*')
-        self.end_headers()
+# How long a proxy request waits for a free upstream slot before giving up
+UPSTREAM_WAIT = 30
 
-    def do_POST(self):
-        if self.path == '/proxy':
-            self.handle_proxy()
-        else:
-            super().do_POST()
+# Webhook event database when neither --events-db nor Supabase is configured.
+# Kept in the user cache directory, never next to the files being served
+EVENTS_DB = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'zonos-api-explorer', 'webhook_events.db')
 
-    def handle_proxy(self):
-        """Proxy requests to external APIs"""
-        try:
-            # Read the request body
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length)
-            request_data = json.loads(body)
-
-            # Extract proxy parameters
-            target_url = request_data.get('url')
-            method = request_data.get('method', 'GET')
-            headers = request_data.get('headers', {})
-            payload = request_data.get('body')
-
-            if not target_url:
-                self.send_error(400, 'Missing URL')
-                return
+# Limits concurrent upstream calls; resized by main() from --max-upstream
+upstream_slots = threading.BoundedSemaphore(MAX_UPSTREAM)
 
-            # Prepare the request
-            req_body = None
-            if payload:
-                if isinstance(payload, dict):
-                    req_body = json.dumps(payload).encode('utf-8')
-                else:
-                    req_body = payload.encode('utf-8')
+# The api/ endpoints, routed the same way as vercel.json routes them
+app = App()
 
-            # Create request
-            req = urllib.request.Request(target_url, data=req_body, method=method)
+# index.html and the images, precompressed in memory
+static = StaticSite(os.path.dirname(os.path.abspath(__file__)))
 
-            # Add headers
-            for key, value in headers.items():
-                req.add_header(key, value)
 
-            # Make the request (with SSL context that accepts all certs for testing)
-            ctx = ssl.create_default_context()
-            ctx.check_hostname = False
-            ctx.verify_mode = ssl.CERT_NONE
+class BoundedThreadingHTTPServer(http.server.ThreadingHTTPServer):
+    """ThreadingHTTPServer that runs requests on a fixed-size worker pool
+    instead of spawning an unbounded thread per connection."""
 
-            try:
-                with urllib.request.urlopen(req, context=ctx, timeout=30) as response:
-                    response_body = response.read().decode('utf-8')
-                    response_headers = dict(response.headers)
-                    status_code = response.status
-
-                    # Send response back
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-
-                    result = {
-                        'status': status_code,
-                        'statusText': response.reason,
-                        'headers': response_headers,
-                        'body': response_body
-                    }
-                    self.wfile.write(json.dumps(result).encode('utf-8'))
-
-            except urllib.error.HTTPError as e:
-                response_body = e.read().decode('utf-8')
-                self.send_response(200)
+    def __init__(self, server_address, handler_class, workers=WORKERS):
+        super().__init__(server_address, handler_class)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http')
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        # Let in-flight requests finish before the process exits
+        self._executor.shutdown(wait=True)
+
+
+class APIProxyHandler(http.server.SimpleHTTPRequestHandler):
+    def do_GET(self):
+        # Only the StaticSite assets are served from the directory; anything
+        # else in it (sources, databases) is not for download
+        if not app.dispatch(self) and not static.serve(self):
+            self.send_error(404)
+
+    def do_HEAD(self):
+        if not app.dispatch(self) and not static.serve(self, head=True):
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path.split('?')[0] == '/proxy':
+            if not upstream_slots.acquire(timeout=UPSTREAM_WAIT):
+                self.send_response(503)
                 self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Retry-After', '1')
                 self.end_headers()
-
-                result = {
-                    'status': e.code,
-                    'statusText': e.reason,
-                    'headers': dict(e.headers),
-                    'body': response_body
-                }
+                result = {'error': True, 'message': 'Server busy, try again'}
                 self.wfile.write(json.dumps(result).encode('utf-8'))
+                return
+            try:
+                app.dispatch(self)
+            finally:
+                upstream_slots.release()
+        elif not app.dispatch(self):
+            self.send_error(404)
 
-        except urllib.error.URLError as e:
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            result = {
-                'error': True,
-                'message': f'Connection failed: {str(e.reason)}'
-            }
-            self.wfile.write(json.dumps(result).encode('utf-8'))
-
-        except Exception as e:
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
+    def do_DELETE(self):
+        if not app.dispatch(self):
+            self.send_error(404)
+
+    def do_OPTIONS(self):
+        """Handle preflight requests"""
+        if not app.dispatch(self):
+            self.send_response(204)
             self.end_headers()
-            result = {
-                'error': True,
-                'message': str(e)
-            }
-            self.wfile.write(json.dumps(result).encode('utf-8'))
 
     def log_message(self, format, *args):
         """Custom log format"""
@@ -137,16 +142,72 @@ class APIProxyHandler(http.server.SimpleHTTPRequestHandler):
             pass  # Ignore logging errors
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='API Explorer Server')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--mode', choices=('threaded', 'single'), default='threaded')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--max-upstream', type=int, default=MAX_UPSTREAM)
+    parser.add_argument('--cache', action='store_true')
+    parser.add_argument('--cache-max-mb', type=int, default=32)
+    parser.add_argument('--coalesce-window-ms', type=float, default=_singleflight.DEFAULT_WINDOW * 1000)
+    parser.add_argument('--max-streams', type=int)
+    parser.add_argument('--events-db')
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument('--record', metavar='PATH')
+    fixtures.add_argument('--replay', metavar='PATH')
+    parser.add_argument('--replay-latency-ms', type=float, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    global upstream_slots
+
+    args = parse_args(argv)
     handler = APIProxyHandler
 
-    with http.server.HTTPServer(('', PORT), handler) as httpd:
+    upstream_slots = threading.BoundedSemaphore(args.max_upstream)
+    # Keep enough idle keep-alive sockets around for every upstream slot
+    get_pool(ALLOWED_HOST).maxsize = args.max_upstream
+    if args.cache:
+        _cache.enable(args.cache_max_mb * 1024 * 1024)
+    if args.record:
+        _fixtures.use_fixtures(args.record, _fixtures.RECORD)
+    elif args.replay:
+        _fixtures.use_fixtures(args.replay, _fixtures.REPLAY, args.replay_latency_ms / 1000)
+    _singleflight.configure(args.coalesce_window_ms / 1000 if args.coalesce_window_ms >= 0 else None)
+    # Webhooks are received and streamed in this process, so live streams are
+    # fed by the in-process broker and rows are flushed in the background
+    broker.local = True
+    if args.mode == 'threaded':
+        broker.max_streams = args.max_streams if args.max_streams is not None else args.workers // 4
+    if args.events_db or _store.get_store() is None:
+        if not args.events_db:
+            os.makedirs(os.path.dirname(EVENTS_DB), exist_ok=True)
+        _store.use_sqlite(args.events_db or EVENTS_DB)
+    queue = get_queue()
+    if queue is not None:
+        queue.start()
+    # Compress the page and images now rather than on the first visit
+    static.lookup('/')
+
+    if args.mode == 'single':
+        httpd = http.server.HTTPServer(('', args.port), handler)
+    else:
+        httpd = BoundedThreadingHTTPServer(('', args.port), handler, workers=args.workers)
+
+    # Treat SIGTERM like Ctrl+C so in-flight requests get to finish
+    def _terminate(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _terminate)
+
+    with httpd:
         print(f"""
 ╔════════════════════════════════════════════════════════════╗
 ║                    API Explorer Server                      ║
 ╠════════════════════════════════════════════════════════════╣
 ║                                                            ║
-║   Server running at: http://localhost:{PORT}                 ║
+║   Server running at: http://localhost:{args.port:<5}                ║
 ║                                                            ║
 ║   Open this URL in your browser to use the API Explorer    ║
 ║                                                            ║
@@ -154,10 +215,23 @@ def main():
 ║                                                            ║
 ╚════════════════════════════════════════════════════════════╝
 """)
+        print(f"   Mode: {args.mode}"
+              + (f" ({args.workers} workers)" if args.mode == 'threaded' else '')
+              + f", max {args.max_upstream} concurrent upstream calls"
+              + (f", {args.cache_max_mb} MB response cache" if args.cache else '') + "\n")
+        store = _store.get_store()
+        print(f"   Webhook events: {store.path if store.local else 'Supabase'}\n")
+        fixtures = _fixtures.get_fixtures()
+        if fixtures is not None:
+            print(f"   Proxy fixtures: {fixtures.mode} {fixtures.path}"
+                  + (f" ({len(fixtures)} recorded)" if fixtures.replaying else '') + "\n")
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
-            print("\nServer stopped.")
+            print("\nShutting down, waiting for in-flight requests...")
+    if queue is not None:
+        queue.stop()
+    print("Server stopped.")
 
 
 if __name__ == '__main__':